@@ -0,0 +1,136 @@
+"""Compare AG-UI streaming over a Unix domain socket against loopback TCP.
+
+Starts the agent twice (once per transport), replays the same questions against each
+with bounded concurrency and reports time to first byte, total latency and throughput.
+Run with a replay cassette so the model does not dominate the numbers:
+
+    LLM_CASSETTE_MODE=replay LLM_CASSETTE_SPEED=0 python bench_transport.py --requests 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, List
+
+import httpx
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))] if ordered else 0.0
+
+
+def load_questions(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["question"] for line in f if line.strip()]
+
+
+def run_input(question: str) -> Dict[str, Any]:
+    return {
+        "threadId": str(uuid.uuid4()),
+        "runId": str(uuid.uuid4()),
+        "state": {},
+        "messages": [{"id": str(uuid.uuid4()), "role": "user", "content": question}],
+        "tools": [],
+        "context": [],
+        "forwardedProps": {},
+    }
+
+
+async def start_agent(env: Dict[str, str], ready_file: str, timeout: float = 120) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, "main.py"], env={**os.environ, **env, "AGENT_READY_FILE": ready_file})
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(ready_file):
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise RuntimeError(f"Agent did not become ready ({env})")
+        await asyncio.sleep(0.1)
+    return process
+
+
+async def stream_one(client: httpx.AsyncClient, url: str, question: str) -> Dict[str, float]:
+    started = time.perf_counter()
+    ttfb = None
+    received = 0
+    async with client.stream(
+        "POST", url, json=run_input(question), headers={"Accept": "text/event-stream"}
+    ) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes():
+            if ttfb is None:
+                ttfb = time.perf_counter() - started
+            received += len(chunk)
+    return {"ttfb": ttfb or 0.0, "latency": time.perf_counter() - started, "bytes": received}
+
+
+async def bench(transport: str, client: httpx.AsyncClient, url: str, questions: List[str], requests: int, concurrency: int) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(i: int) -> Dict[str, float]:
+        async with semaphore:
+            return await stream_one(client, url, questions[i % len(questions)])
+
+    # One warm request so connection setup and lazy imports don't skew the first sample
+    await stream_one(client, url, questions[0])
+    started = time.perf_counter()
+    results = await asyncio.gather(*(bounded(i) for i in range(requests)))
+    wall = time.perf_counter() - started
+    ttfbs = [r["ttfb"] * 1000 for r in results]
+    latencies = [r["latency"] * 1000 for r in results]
+    total_bytes = sum(r["bytes"] for r in results)
+    return {
+        "transport": transport,
+        "requests": requests,
+        "req_per_s": round(requests / wall, 1),
+        "mb_per_s": round(total_bytes / wall / 1e6, 2),
+        "ttfb_p50_ms": round(percentile(ttfbs, 50), 2),
+        "ttfb_p95_ms": round(percentile(ttfbs, 95), 2),
+        "latency_mean_ms": round(statistics.mean(latencies), 2),
+        "latency_p95_ms": round(percentile(latencies, 95), 2),
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    questions = load_questions(args.questions)
+    workdir = tempfile.mkdtemp(prefix="bench_transport_")
+    socket_path = os.path.join(workdir, "agent.sock")
+    limits = httpx.Limits(max_connections=args.concurrency)
+    setups = [
+        ("tcp", {"PYTHON_PORT": str(args.port)}, httpx.AsyncHTTPTransport(limits=limits), f"http://127.0.0.1:{args.port}/"),
+        ("uds", {"AGENT_UDS_PATH": socket_path}, httpx.AsyncHTTPTransport(uds=socket_path, limits=limits), "http://agent/"),
+    ]
+
+    rows = []
+    for transport, env, http_transport, url in setups:
+        process = await start_agent(env, os.path.join(workdir, f"{transport}.ready"))
+        try:
+            async with httpx.AsyncClient(transport=http_transport, timeout=120) as client:
+                rows.append(await bench(transport, client, url, questions, args.requests, args.concurrency))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    print(json.dumps(rows, indent=2))
+    columns = list(rows[0])
+    print()
+    print("  ".join(column.rjust(15) for column in columns))
+    for row in rows:
+        print("  ".join(str(row[column]).rjust(15) for column in columns))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", default="eval_questions.jsonl", help="JSONL file of questions to send")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per transport")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at once")
+    parser.add_argument("--port", type=int, default=8011, help="TCP port for the TCP run")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+
+logger = logging.getLogger(__name__)
+
+# "record" saves every model exchange, "replay" serves them back without calling the model
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "").lower()
+LLM_CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", "cassettes/llm.jsonl")
+# Replay speed: 1 reproduces recorded chunk timings, 10 is ten times faster, 0 disables delays
+LLM_CASSETTE_SPEED = float(os.getenv("LLM_CASSETTE_SPEED", "1"))
+
+# Note timestamps ("2026-01-02 10:00:00") and note filenames ("2026-01-02_10-00-00_note.md")
+_TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2}[ T_]\d{2}[:-]\d{2}[:-]\d{2}")
+
+
+def _normalize(value: Any) -> Any:
+    """Strip what differs between runs of the same conversation, so keys stay stable.
+
+    Drops generated function call IDs and tool results (the call and its arguments still
+    identify the turn), and masks timestamps in text such as the notes in the system prompt.
+    """
+    if isinstance(value, dict):
+        normalized = {}
+        for k, v in value.items():
+            if k == "id":
+                continue
+            if k == "function_response" and isinstance(v, dict):
+                v = {"name": v.get("name")}
+            normalized[k] = _normalize(v)
+        return normalized
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    if isinstance(value, str):
+        return _TIMESTAMP.sub("<timestamp>", value)
+    return value
+
+
+def request_key(llm_request: LlmRequest) -> str:
+    config = llm_request.config
+    payload = {
+        "model": llm_request.model,
+        "contents": [content.model_dump(mode="json", exclude_none=True) for content in llm_request.contents],
+        "system_instruction": str(config.system_instruction) if config else None,
+        "tools": [tool.model_dump(mode="json", exclude_none=True) for tool in (config.tools or [])] if config else [],
+    }
+    canonical = json.dumps(_normalize(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class Cassette:
+    """JSONL file of recorded exchanges: one line per request with its streamed chunks and their offsets."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._exchanges: Dict[str, List[List[List[Any]]]] = defaultdict(list)
+        self._replayed: Dict[str, int] = defaultdict(int)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._exchanges[entry["key"]].append(entry["chunks"])
+
+    def record(self, key: str, chunks: List[List[Any]]) -> None:
+        line = json.dumps({"key": key, "chunks": chunks}, separators=(",", ":"))
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self._exchanges[key].append(chunks)
+
+    def lookup(self, key: str) -> Optional[List[List[Any]]]:
+        """Next recorded exchange for `key`; repeated identical requests cycle through their recordings."""
+        exchanges = self._exchanges.get(key)
+        if not exchanges:
+            return None
+        index = self._replayed[key] % len(exchanges)
+        self._replayed[key] += 1
+        return exchanges[index]
+
+
+_cassettes: Dict[str, Cassette] = {}
+
+
+def get_cassette(path: str = LLM_CASSETTE_PATH) -> Cassette:
+    if path not in _cassettes:
+        _cassettes[path] = Cassette(path)
+    return _cassettes[path]
+
+
+class CassetteLlm(BaseLlm):
+    """Wraps a model to record its streamed responses, or to replay them with the recorded timing."""
+
+    inner: BaseLlm
+    mode: str
+    cassette: Cassette
+    speed: float = LLM_CASSETTE_SPEED
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        key = request_key(llm_request)
+        if self.mode == "replay":
+            chunks = self.cassette.lookup(key)
+            if chunks is None:
+                raise LookupError(f"No cassette entry for request {key[:12]} in {self.cassette.path}")
+            started = time.perf_counter()
+            for offset, payload in chunks:
+                if self.speed > 0:
+                    delay = offset / self.speed - (time.perf_counter() - started)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                yield LlmResponse.model_validate(payload)
+            return
+
+        recorded: List[List[Any]] = []
+        started = time.perf_counter()
+        async for response in self.inner.generate_content_async(llm_request, stream=stream):
+            recorded.append([
+                round(time.perf_counter() - started, 4),
+                response.model_dump(mode="json", exclude_none=True),
+            ])
+            yield response
+        self.cassette.record(key, recorded)
+
+
+def with_cassette(model: BaseLlm) -> BaseLlm:
+    """Wrap `model` when LLM_CASSETTE_MODE is record or replay; otherwise return it unchanged."""
+    if LLM_CASSETTE_MODE not in ("record", "replay"):
+        return model
+    logger.info(f"LLM cassette {LLM_CASSETTE_MODE} mode using {LLM_CASSETTE_PATH}")
+    return CassetteLlm(model=model.model, inner=model, mode=LLM_CASSETTE_MODE, cassette=get_cassette())
@@ -1,7 +1,7 @@
 from google.adk.agents import LlmAgent, Agent
 from google.adk.models.lite_llm import LiteLlm
 from google.adk.agents.base_agent import BaseAgent
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
 from google.adk.agents.invocation_context import InvocationContext
 from google.adk.events import Event
 
@@ -9,22 +9,64 @@ from google.adk.events import Event
 
 import os
 
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse, LLMRegistry
+
+from common.cassette import with_cassette
+
 # Configure model based on USE_LITELLM setting
 use_litellm = os.getenv("USE_LITELLM", "false").lower() == "true"
 model_name = os.getenv("MODEL_NAME", "gemini-2.5-pro")
 
-if use_litellm:
-    # Use LiteLLM for multi-model support (google_search won't work)
-    if model_name.startswith("gemini") and not model_name.startswith("gemini/"):
-        litellm_model = f"gemini/{model_name}"
-    else:
-        litellm_model = model_name
-    model = LiteLlm(model=litellm_model)
-    print(f"Using LiteLLM with model: {litellm_model}")
-else:
+
+def resolve_model_name(name: str) -> str:
+    """Model name as the configured backend expects it."""
+    if use_litellm and name.startswith("gemini") and not name.startswith("gemini/"):
+        return f"gemini/{name}"
+    return name
+
+
+def reasoning_effort(thinking_budget: int) -> Optional[str]:
+    """LiteLLM reasoning_effort closest to a Gemini thinking budget; None leaves the model default."""
+    if thinking_budget <= 0:
+        return None
+    if thinking_budget <= 1024:
+        return "low"
+    return "medium" if thinking_budget <= 8192 else "high"
+
+
+class RoutedLiteLlm(LiteLlm):
+    """LiteLlm that honours the request's thinking budget, which LiteLlm itself ignores.
+
+    The budget set in thinking_config (see common.router) is sent as LiteLLM's
+    reasoning_effort, which LiteLLM translates per provider.
+    """
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        thinking = llm_request.config.thinking_config if llm_request.config else None
+        effort = reasoning_effort(thinking.thinking_budget or 0) if thinking else None
+        model = self
+        if effort:
+            # Per-request copy so concurrent requests don't share completion args
+            model = self.model_copy()
+            model._additional_args = {**self._additional_args, "reasoning_effort": effort}
+        async for response in LiteLlm.generate_content_async(model, llm_request, stream=stream):
+            yield response
+
+
+def build_model(name: str) -> BaseLlm:
+    """Create the model client for `name`, honouring USE_LITELLM and LLM_CASSETTE_MODE."""
+    name = resolve_model_name(name)
+    if use_litellm:
+        # Use LiteLLM for multi-model support (google_search won't work)
+        return with_cassette(RoutedLiteLlm(model=name))
     # Use native Gemini model (required for google_search tool)
-    model = model_name
-    print(f"Using native Gemini model: {model_name}")
+    return with_cassette(LLMRegistry.new_llm(name))
+
+
+model = build_model(model_name)
+print(f"Using {'LiteLLM' if use_litellm else 'native Gemini'} with model: {model.model}")
 
 
 
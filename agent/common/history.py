@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from google.adk.models import BaseLlm, LlmRequest
+from google.genai import types
+
+from common.custom_agent import build_model
+
+logger = logging.getLogger(__name__)
+
+# Start summarizing once the history sent to the model passes this many (estimated) tokens
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", "6000"))
+# Most recent history kept verbatim after summarizing
+HISTORY_KEEP_RECENT_TOKENS = int(os.getenv("HISTORY_KEEP_RECENT_TOKENS", "2000"))
+HISTORY_SUMMARY_MAX_TOKENS = int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", "400"))
+# Re-summarize only once the turns not yet in the summary reach this many (estimated) tokens
+HISTORY_SUMMARY_BATCH_TOKENS = int(os.getenv("HISTORY_SUMMARY_BATCH_TOKENS", "1500"))
+# Unset disables summarization (old turns are dropped instead): summarizing on the serving
+# model would add a second generation per turn on the same backend
+SUMMARY_MODEL_NAME = os.getenv("SUMMARY_MODEL_NAME")
+# Sessions whose summaries are kept; the least recently summarized are dropped first
+HISTORY_MAX_SESSIONS = int(os.getenv("HISTORY_MAX_SESSIONS", "1000"))
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a recruiter and Bharath's assistant. "
+    "Merge the new turns into the existing summary. Keep names, companies, roles, requirements, "
+    "questions asked and answers given. Reply with the updated summary only, in under "
+    f"{HISTORY_SUMMARY_MAX_TOKENS} tokens."
+)
+
+
+def estimate_tokens(contents: List[types.Content]) -> int:
+    """Rough token count (4 characters per token) that is cheap enough to run on every turn."""
+    chars = 0
+    for content in contents:
+        for part in content.parts or []:
+            if part.text:
+                chars += len(part.text)
+            elif part.function_call or part.function_response:
+                chars += len(str(part.function_call or part.function_response))
+    return chars // 4
+
+
+def _render(contents: List[types.Content]) -> str:
+    lines = []
+    for content in contents:
+        text = " ".join(part.text for part in content.parts or [] if part.text and not part.thought)
+        if text:
+            lines.append(f"{content.role}: {text}")
+    return "\n".join(lines)
+
+
+def _fingerprint(contents: List[types.Content]) -> str:
+    return hashlib.sha1(_render(contents).encode()).hexdigest()
+
+
+def _is_turn_start(content: types.Content) -> bool:
+    """A user message with text, i.e. not a function response, so tool call pairs stay together."""
+    return content.role == "user" and any(part.text for part in content.parts or [])
+
+
+@dataclass
+class _Summary:
+    text: str
+    covered: int
+    fingerprint: str
+
+
+class HistoryCompactor:
+    """Replaces the oldest turns in an LlmRequest with a rolling summary kept per session.
+
+    Summaries are produced in background tasks by a (cheaper) summary model, so the
+    request being built never waits on them. Turns past the summary are kept verbatim
+    until they add up to HISTORY_SUMMARY_BATCH_TOKENS, then folded in with one call;
+    without a summary model the oldest turns are simply dropped.
+    """
+
+    def __init__(self, summary_model: Optional[BaseLlm] = None):
+        self._summary_model = summary_model
+        self._summaries: "OrderedDict[str, _Summary]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Task] = {}
+        if summary_model is None and SUMMARY_MODEL_NAME:
+            self._summary_model = build_model(SUMMARY_MODEL_NAME)
+        if self._summary_model is None:
+            logger.warning("SUMMARY_MODEL_NAME is not set; old chat turns are dropped instead of summarized")
+
+    @property
+    def summary_model(self) -> Optional[BaseLlm]:
+        return self._summary_model
+
+    def _cut_index(self, contents: List[types.Content]) -> int:
+        """Index of the first turn kept verbatim: keep as much recent history as the budget allows."""
+        kept = 0
+        cut = len(contents)
+        for i in range(len(contents) - 1, -1, -1):
+            kept += estimate_tokens([contents[i]])
+            if kept > HISTORY_KEEP_RECENT_TOKENS:
+                break
+            if _is_turn_start(contents[i]):
+                cut = i
+        if cut == len(contents):
+            # Even the latest turn exceeds the budget; keep it anyway
+            cut = next((i for i in range(len(contents) - 1, -1, -1) if _is_turn_start(contents[i])), 0)
+        return cut
+
+    def compact(self, session_id: str, llm_request: LlmRequest) -> None:
+        """Shrink llm_request.contents in place if it is over budget."""
+        contents = llm_request.contents
+        if estimate_tokens(contents) <= HISTORY_MAX_TOKENS:
+            return
+        cut = self._cut_index(contents)
+        if cut == 0:
+            return
+
+        summary = self._summaries.get(session_id)
+        if summary and (summary.covered > len(contents) or _fingerprint(contents[: summary.covered]) != summary.fingerprint):
+            # History was rewritten underneath us (e.g. session compaction); start over
+            summary = None
+            self._summaries.pop(session_id, None)
+
+        covered = summary.covered if summary else 0
+        start = max(covered, cut)
+        if covered < cut and estimate_tokens(contents[covered:cut]) < HISTORY_SUMMARY_BATCH_TOKENS:
+            # Not worth a summary call yet: keep the few uncovered turns verbatim
+            start = covered
+        elif covered < cut and self._summary_model is not None:
+            self._schedule(session_id, contents[:cut], summary)
+        compacted = []
+        if summary:
+            compacted.append(
+                types.Content(role="user", parts=[types.Part(text=f"Summary of the earlier conversation:\n{summary.text}")])
+            )
+        dropped = start - covered
+        if dropped:
+            logger.debug(f"Session {session_id}: {dropped} turns dropped while summary catches up")
+        llm_request.contents = compacted + contents[start:]
+
+    def _schedule(self, session_id: str, contents: List[types.Content], previous: Optional[_Summary]) -> None:
+        task = self._pending.get(session_id)
+        if task and not task.done():
+            return
+        self._pending[session_id] = asyncio.create_task(self._summarize(session_id, contents, previous))
+
+    async def _summarize(self, session_id: str, contents: List[types.Content], previous: Optional[_Summary]) -> None:
+        new_turns = contents[previous.covered:] if previous else contents
+        prompt = f"Existing summary:\n{previous.text if previous else '(none)'}\n\nNew turns:\n{_render(new_turns)}"
+        request = LlmRequest(
+            model=self.summary_model.model,
+            contents=[types.Content(role="user", parts=[types.Part(text=prompt)])],
+            config=types.GenerateContentConfig(
+                system_instruction=SUMMARY_PROMPT,
+                max_output_tokens=HISTORY_SUMMARY_MAX_TOKENS,
+                temperature=0.0,
+            ),
+        )
+        try:
+            text = ""
+            async for response in self.summary_model.generate_content_async(request):
+                if response.content and response.content.parts:
+                    text += "".join(part.text or "" for part in response.content.parts if not part.thought)
+            if text.strip():
+                self._summaries[session_id] = _Summary(text.strip(), len(contents), _fingerprint(contents))
+                self._summaries.move_to_end(session_id)
+                while len(self._summaries) > HISTORY_MAX_SESSIONS:
+                    self._summaries.popitem(last=False)
+                logger.info(f"Session {session_id}: summary now covers {len(contents)} turns")
+        except Exception as e:
+            logger.warning(f"History summarization failed for session {session_id}: {e}")
+        finally:
+            self._pending.pop(session_id, None)
+
+    def forget(self, session_id: str) -> None:
+        self._summaries.pop(session_id, None)
+        task = self._pending.pop(session_id, None)
+        if task:
+            task.cancel()
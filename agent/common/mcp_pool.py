@@ -0,0 +1,259 @@
+import asyncio
+import logging
+import os
+import random
+import shutil
+import time
+from typing import Any, Dict, List, Optional
+
+import anyio
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.tools import BaseTool, ToolContext
+from google.adk.tools.base_toolset import BaseToolset
+from google.adk.tools.mcp_tool import McpToolset, StdioConnectionParams
+from mcp.client.stdio import StdioServerParameters
+
+logger = logging.getLogger(__name__)
+
+# Directory holding a pre-installed `node_modules` tree (see scripts/vendor-mcp-servers.sh).
+# When set, servers are launched with `node` straight from it and never touch the network.
+MCP_VENDOR_DIR = os.getenv("MCP_VENDOR_DIR")
+MCP_REPLICAS = int(os.getenv("MCP_REPLICAS", "1"))
+MCP_MAX_CONCURRENCY = int(os.getenv("MCP_MAX_CONCURRENCY", "4"))
+MCP_HEALTH_INTERVAL = float(os.getenv("MCP_HEALTH_INTERVAL", "30"))
+MCP_TIMEOUT = float(os.getenv("MCP_TIMEOUT", "120"))
+
+# Errors meaning the server process or its stdio pipes are gone, as opposed to a failed call
+_TRANSPORT_ERRORS = (ConnectionError, EOFError, ProcessLookupError, anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream)
+
+
+def _is_transport_error(error: BaseException) -> bool:
+    if isinstance(error, BaseExceptionGroup):
+        return any(_is_transport_error(e) for e in error.exceptions)
+    return isinstance(error, _TRANSPORT_ERRORS)
+
+
+def server_params(package: str, args: Optional[List[str]] = None, bin_name: Optional[str] = None) -> StdioServerParameters:
+    """Build stdio params for an MCP server package, preferring the vendored install over npx."""
+    args = list(args or [])
+    bin_name = bin_name or "mcp-" + package.rsplit("/", 1)[-1]
+    if MCP_VENDOR_DIR:
+        vendored_bin = os.path.join(MCP_VENDOR_DIR, "node_modules", ".bin", bin_name)
+        if os.path.exists(vendored_bin):
+            return StdioServerParameters(command=vendored_bin, args=args)
+        logger.warning(f"{bin_name} not found in {MCP_VENDOR_DIR}, falling back to npx --offline")
+    # --offline makes npx fail fast instead of fetching when the package is not in the npm cache
+    return StdioServerParameters(
+        command=shutil.which("npx") or "npx",
+        args=["--offline", "-y", package, *args],
+    )
+
+
+class _McpReplica:
+    """A single MCP server process with its own concurrency limit and restart backoff."""
+
+    def __init__(self, name: str, params: StdioServerParameters, max_concurrency: int):
+        self.name = name
+        self.params = params
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.toolset: Optional[McpToolset] = None
+        self.tools: Dict[str, BaseTool] = {}
+        self.healthy = False
+        self.in_flight = 0
+        self.restarts = 0
+        self.failures = 0
+        self.next_restart_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        async with self._lock:
+            await self._close_toolset()
+            self.toolset = McpToolset(
+                connection_params=StdioConnectionParams(server_params=self.params, timeout=MCP_TIMEOUT),
+            )
+            started = time.perf_counter()
+            tools = await self.toolset.get_tools()
+            self.tools = {tool.name: tool for tool in tools}
+            self.healthy = True
+            self.failures = 0
+            logger.info(f"MCP {self.name} ready with {len(tools)} tools in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    async def health_check(self) -> bool:
+        if not self.healthy or self.toolset is None:
+            return False
+        try:
+            # list_tools round-trips through the server, so a dead process fails here
+            await asyncio.wait_for(self.toolset.get_tools(), timeout=MCP_TIMEOUT)
+            return True
+        except Exception as e:
+            self.mark_crashed(e)
+            return False
+
+    def mark_crashed(self, error: BaseException) -> None:
+        self.healthy = False
+        self.failures += 1
+        # Exponential backoff with jitter, capped at one minute
+        delay = min(60.0, 0.5 * (2 ** (self.failures - 1))) * (0.5 + random.random() / 2)
+        self.next_restart_at = time.monotonic() + delay
+        logger.warning(f"MCP {self.name} marked unhealthy ({error}); restart in {delay:.1f}s")
+
+    async def restart_if_due(self) -> None:
+        if self.healthy or time.monotonic() < self.next_restart_at:
+            return
+        try:
+            await self.start()
+            self.restarts += 1
+        except Exception as e:
+            self.mark_crashed(e)
+
+    async def close(self) -> None:
+        async with self._lock:
+            await self._close_toolset()
+            self.healthy = False
+
+    async def _close_toolset(self) -> None:
+        if self.toolset is not None:
+            await self.toolset.close()
+            self.toolset = None
+            self.tools = {}
+
+
+class _PooledMcpTool(BaseTool):
+    """Routes calls for one MCP tool to the least busy healthy replica and records latency."""
+
+    def __init__(self, server: "PooledMcpServer", template: BaseTool):
+        super().__init__(name=template.name, description=template.description)
+        self._server = server
+        self._template = template
+
+    def _get_declaration(self):
+        return self._template._get_declaration()
+
+    async def run_async(self, *, args: Dict[str, Any], tool_context: ToolContext) -> Any:
+        return await self._server.call_tool(self.name, args=args, tool_context=tool_context)
+
+
+class PooledMcpServer(BaseToolset):
+    """Toolset backed by long-lived, supervised MCP server processes shared by every session."""
+
+    def __init__(
+        self,
+        name: str,
+        params: StdioServerParameters,
+        replicas: int = MCP_REPLICAS,
+        max_concurrency: int = MCP_MAX_CONCURRENCY,
+        tool_filter: Optional[List[str]] = None,
+    ):
+        super().__init__(tool_filter=tool_filter)
+        self.name = name
+        self.replicas = [_McpReplica(f"{name}#{i}", params, max_concurrency) for i in range(max(1, replicas))]
+        self.stats: Dict[str, Any] = {"calls": 0, "errors": 0, "total_ms": 0.0, "last_ms": 0.0}
+
+    async def start(self) -> None:
+        """Spawn every replica and wait for its first successful list_tools."""
+        results = await asyncio.gather(*(replica.start() for replica in self.replicas), return_exceptions=True)
+        for replica, result in zip(self.replicas, results):
+            if isinstance(result, Exception):
+                replica.mark_crashed(result)
+        if not any(replica.healthy for replica in self.replicas):
+            raise ConnectionError(f"MCP server {self.name} failed to start")
+
+    async def supervise(self) -> None:
+        """Health-check replicas and restart crashed ones until cancelled."""
+        while True:
+            await asyncio.sleep(MCP_HEALTH_INTERVAL)
+            for replica in self.replicas:
+                if replica.healthy:
+                    if replica.in_flight == 0:
+                        await replica.health_check()
+                else:
+                    await replica.restart_if_due()
+
+    async def get_tools(self, readonly_context: Optional[ReadonlyContext] = None) -> List[BaseTool]:
+        replica = next((r for r in self.replicas if r.healthy), None)
+        if replica is None:
+            # ADK resolves tools on every turn: restart only when the backoff allows, and
+            # answer without these tools meanwhile rather than failing the turn
+            for r in self.replicas:
+                await r.restart_if_due()
+            replica = next((r for r in self.replicas if r.healthy), None)
+            if replica is None:
+                logger.warning(f"MCP {self.name} is down, continuing without its tools")
+                return []
+        return [
+            _PooledMcpTool(self, tool)
+            for tool in replica.tools.values()
+            if self._is_tool_selected(tool, readonly_context)
+        ]
+
+    async def call_tool(self, tool_name: str, *, args: Dict[str, Any], tool_context: ToolContext) -> Any:
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy:
+            for replica in self.replicas:
+                await replica.restart_if_due()
+            healthy = [r for r in self.replicas if r.healthy]
+            if not healthy:
+                raise ConnectionError(f"No healthy MCP process for {self.name}")
+
+        replica = min(healthy, key=lambda r: r.in_flight)
+        replica.in_flight += 1
+        started = time.perf_counter()
+        try:
+            async with replica.semaphore:
+                return await replica.tools[tool_name].run_async(args=args, tool_context=tool_context)
+        except Exception as e:
+            self.stats["errors"] += 1
+            # A timed out or rejected call leaves the process usable; only a broken pipe means it died
+            if _is_transport_error(e):
+                replica.mark_crashed(e)
+            raise
+        finally:
+            replica.in_flight -= 1
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.stats["calls"] += 1
+            self.stats["total_ms"] += elapsed_ms
+            self.stats["last_ms"] = round(elapsed_ms, 2)
+            logger.info(f"MCP {replica.name} {tool_name} took {elapsed_ms:.1f}ms")
+
+    def snapshot(self) -> Dict[str, Any]:
+        calls = self.stats["calls"]
+        return {
+            **self.stats,
+            "avg_ms": round(self.stats["total_ms"] / calls, 2) if calls else 0.0,
+            "replicas": [
+                {"name": r.name, "healthy": r.healthy, "in_flight": r.in_flight, "restarts": r.restarts}
+                for r in self.replicas
+            ],
+        }
+
+    async def close(self) -> None:
+        """No-op: ADK's Runner.close() closes every toolset after each run, but these
+        processes are shared across runs and are only stopped by shutdown()."""
+
+    async def shutdown(self) -> None:
+        for replica in self.replicas:
+            await replica.close()
+
+
+class McpProcessPool:
+    """Starts pooled MCP servers at boot and keeps them supervised for the life of the process."""
+
+    def __init__(self, servers: List[PooledMcpServer]):
+        self.servers = {server.name: server for server in servers}
+        self._supervisors: List[asyncio.Task] = []
+
+    async def start(self, names: Optional[List[str]] = None) -> None:
+        for name in names or list(self.servers):
+            server = self.servers[name]
+            await server.start()
+            self._supervisors.append(asyncio.create_task(server.supervise()))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: server.snapshot() for name, server in self.servers.items()}
+
+    async def shutdown(self) -> None:
+        for task in self._supervisors:
+            task.cancel()
+        self._supervisors = []
+        for server in self.servers.values():
+            await server.shutdown()
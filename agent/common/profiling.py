@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from types import FrameType
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_INTERVAL_MS = float(os.getenv("LOOP_LAG_INTERVAL_MS", "50"))
+# Log the event loop's stack when a single callback blocks it for longer than this
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "250"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+PROFILE_MIN_INTERVAL_MS = 1.0
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame: Optional[FrameType]) -> List[str]:
+    """Frame names from the outermost call to the innermost."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+class SamplingProfiler:
+    """Samples a thread's stack from a helper thread, so the profiled code needs no instrumentation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.running = False
+        # Mean time between samples in the last profile, what each sample actually stands for
+        self.interval_ms = 0.0
+
+    def sample(self, thread_id: int, seconds: float, interval_ms: float) -> Counter:
+        """Collect collapsed stacks for `thread_id` for `seconds`; blocks the calling thread."""
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        self.running = True
+        stacks: Counter = Counter()
+        try:
+            started = time.monotonic()
+            deadline = started + min(seconds, PROFILE_MAX_SECONDS)
+            # A shorter interval would spin the sampler thread and starve the loop of the GIL
+            interval = max(interval_ms, PROFILE_MIN_INTERVAL_MS) / 1000
+            ticks = 0
+            while time.monotonic() < deadline:
+                frame = sys._current_frames().get(thread_id)
+                if frame is not None:
+                    stacks[";".join(_collapse(frame))] += 1
+                ticks += 1
+                time.sleep(interval)
+            # Sleeps overshoot, so measure rather than trust the requested interval
+            self.interval_ms = (time.monotonic() - started) * 1000 / ticks if ticks else interval * 1000
+        finally:
+            self.running = False
+            self._lock.release()
+        return stacks
+
+    async def profile_loop(self, seconds: float, interval_ms: float = 5.0) -> Counter:
+        """Profile the thread running the current event loop without blocking it."""
+        thread_id = threading.get_ident()
+        return await asyncio.to_thread(self.sample, thread_id, seconds, interval_ms)
+
+
+def to_collapsed(stacks: Counter) -> str:
+    """Brendan Gregg's collapsed format, ready for flamegraph.pl or speedscope."""
+    return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
+
+
+def to_speedscope(stacks: Counter, interval_ms: float, name: str = "profile_agent") -> Dict[str, Any]:
+    frames: List[Dict[str, str]] = []
+    index: Dict[str, int] = {}
+    samples, weights = [], []
+    for stack, count in stacks.items():
+        ids = []
+        for frame_name in stack.split(";"):
+            if frame_name not in index:
+                index[frame_name] = len(frames)
+                frames.append({"name": frame_name})
+            ids.append(index[frame_name])
+        samples.append(ids)
+        weights.append(count * interval_ms)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+    }
+
+
+class LoopLagMonitor:
+    """Detects callbacks that block the event loop and logs where the loop was stuck.
+
+    A task on the loop refreshes a heartbeat; a watchdog thread notices when the heartbeat
+    goes stale and captures the loop thread's stack while it is still blocked.
+    """
+
+    def __init__(self, interval_ms: float = LOOP_LAG_INTERVAL_MS, threshold_ms: float = LOOP_LAG_THRESHOLD_MS):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.max_lag_ms = 0.0
+        self.blocked_count = 0
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    async def _beat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = time.monotonic() - expected
+            self.max_lag_ms = max(self.max_lag_ms, lag * 1000)
+            self._heartbeat = time.monotonic()
+
+    def _watch(self) -> None:
+        reported = False
+        while not self._stop.wait(self.interval):
+            stalled = time.monotonic() - self._heartbeat
+            if stalled < self.threshold:
+                reported = False
+                continue
+            if reported:
+                continue
+            # Report each stall once, with the stack that is holding the loop
+            reported = True
+            self.blocked_count += 1
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "<no frame>"
+            logger.warning(f"Event loop blocked for {stalled * 1000:.0f}ms+, stack:\n{stack}")
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.create_task(self._beat())
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "max_lag_ms": round(self.max_lag_ms, 1),
+            "blocked_count": self.blocked_count,
+            "threshold_ms": self.threshold * 1000,
+        }
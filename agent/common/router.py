@@ -0,0 +1,124 @@
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from common.custom_agent import model_name, resolve_model_name
+
+logger = logging.getLogger(__name__)
+
+SMALL_MODEL_NAME = resolve_model_name(os.getenv("SMALL_MODEL_NAME", model_name))
+LARGE_MODEL_NAME = resolve_model_name(os.getenv("LARGE_MODEL_NAME", model_name))
+# Thinking budget (tokens) for each tier; 0 disables thinking
+THINKING_BUDGETS = {
+    "simple": int(os.getenv("THINKING_BUDGET_SIMPLE", "0")),
+    "standard": int(os.getenv("THINKING_BUDGET_STANDARD", "0")),
+    "complex": int(os.getenv("THINKING_BUDGET_COMPLEX", "1024")),
+}
+
+# Comparisons and job-description fit questions: complex on their own
+_FIT_PATTERNS = re.compile(
+    r"\b(compare\w*|comparison|versus|vs\.?|fit|match\w*|gaps?|suitable|qualif\w*|job description|jd|"
+    r"requirements?)\b",
+    re.IGNORECASE,
+)
+# Asks that need reasoning over the profile rather than a lookup
+_COMPLEX_PATTERNS = re.compile(
+    r"\b(evaluate|assess|strength\w*|weakness\w*|why|explain|trade-?offs?|pros and cons)\b",
+    re.IGNORECASE,
+)
+# Short factual lookups
+_SIMPLE_PATTERNS = re.compile(
+    r"^\s*(hi|hello|hey|thanks|thank you|ok|okay)\b|\b(email|phone|contact|website|age|where|when|"
+    r"how many years|nationality|languages|hobbies|certif\w*|degree|education)\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class RouteDecision:
+    tier: str
+    model: str
+    thinking_budget: int
+    score: int
+    reasons: List[str] = field(default_factory=list)
+    classify_us: float = 0.0
+
+
+def classify(query: str, history_turns: int = 0) -> RouteDecision:
+    """Score a query with cheap heuristics and pick the model tier and thinking budget."""
+    started = time.perf_counter()
+    words = len(query.split())
+    score = 0
+    reasons = []
+
+    if words > 120 or query.count("\n") > 5:
+        # Pasted job descriptions and long briefs
+        score += 3
+        reasons.append("long_input")
+    elif words > 30:
+        score += 1
+        reasons.append("medium_input")
+    fit_hits = len(_FIT_PATTERNS.findall(query))
+    if fit_hits:
+        score += 3
+        reasons.append(f"fit_terms:{fit_hits}")
+    complex_hits = len(_COMPLEX_PATTERNS.findall(query))
+    if complex_hits:
+        score += min(complex_hits, 3)
+        reasons.append(f"reasoning_terms:{complex_hits}")
+    if query.count("?") > 1:
+        score += 1
+        reasons.append("multi_question")
+    if history_turns > 10:
+        score += 1
+        reasons.append("long_history")
+    if _SIMPLE_PATTERNS.search(query) and words <= 15 and not fit_hits:
+        score -= 2
+        reasons.append("factual_lookup")
+
+    tier = "complex" if score >= 3 else "standard" if score >= 1 else "simple"
+    return RouteDecision(
+        tier=tier,
+        model=SMALL_MODEL_NAME if tier == "simple" else LARGE_MODEL_NAME,
+        thinking_budget=THINKING_BUDGETS[tier],
+        score=score,
+        reasons=reasons,
+        classify_us=round((time.perf_counter() - started) * 1e6, 1),
+    )
+
+
+class RoutingStats:
+    """Per-tier counters so routing decisions can be compared against the latency they produce."""
+
+    def __init__(self):
+        self._tiers: Dict[str, Dict[str, float]] = {}
+
+    def record(self, tier: str, duration: float, response_tokens: int) -> None:
+        stats = self._tiers.setdefault(tier, {"requests": 0, "total_s": 0.0, "max_s": 0.0, "response_tokens": 0})
+        stats["requests"] += 1
+        stats["total_s"] += duration
+        stats["max_s"] = max(stats["max_s"], duration)
+        stats["response_tokens"] += response_tokens
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            tier: {
+                **stats,
+                "avg_s": round(stats["total_s"] / stats["requests"], 3),
+                "model": SMALL_MODEL_NAME if tier == "simple" else LARGE_MODEL_NAME,
+                "thinking_budget": THINKING_BUDGETS[tier],
+            }
+            for tier, stats in self._tiers.items()
+        }
+
+
+routing_stats = RoutingStats()
+
+
+def user_query(user_content: Optional[Any]) -> str:
+    if not user_content or not user_content.parts:
+        return ""
+    return " ".join(part.text for part in user_content.parts if part.text)
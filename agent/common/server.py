@@ -0,0 +1,61 @@
+import asyncio
+import os
+import signal
+from typing import Awaitable, Callable, Optional
+
+import uvicorn
+
+# Listen on a Unix domain socket instead of TCP when set (same-container Next.js route)
+AGENT_UDS_PATH = os.getenv("AGENT_UDS_PATH")
+# Touched once the server is ready (accepting connections and, with `ready`, warmed up), removed on shutdown
+AGENT_READY_FILE = os.getenv("AGENT_READY_FILE")
+# PID to send SIGUSR1 once accepting connections, so the entrypoint can wait instead of polling the port
+AGENT_NOTIFY_PID = os.getenv("AGENT_NOTIFY_PID")
+
+
+class ReadyServer(uvicorn.Server):
+    """uvicorn server that reports readiness only after lifespan startup and socket bind succeed.
+
+    AGENT_NOTIFY_PID is signalled as soon as the server accepts connections. With `ready`,
+    the ready file is written only once that coroutine (e.g. the model warmup) returns.
+    """
+
+    def __init__(self, config: uvicorn.Config, ready: Optional[Callable[[], Awaitable[None]]] = None):
+        super().__init__(config)
+        self.ready = ready
+        self._ready_task: Optional[asyncio.Task] = None
+
+    async def startup(self, sockets=None) -> None:
+        await super().startup(sockets)
+        if not self.started:
+            return
+        if AGENT_NOTIFY_PID:
+            os.kill(int(AGENT_NOTIFY_PID), signal.SIGUSR1)
+        print(f"Agent listening on {AGENT_UDS_PATH or f'{self.config.host}:{self.config.port}'}")
+        self._ready_task = asyncio.create_task(self._report_ready())
+
+    async def _report_ready(self) -> None:
+        if self.ready is not None:
+            await self.ready()
+        if AGENT_READY_FILE:
+            with open(AGENT_READY_FILE, "w") as f:
+                f.write(str(os.getpid()))
+        print("Agent ready")
+
+    async def shutdown(self, sockets=None) -> None:
+        if self._ready_task is not None:
+            self._ready_task.cancel()
+        if AGENT_READY_FILE and os.path.exists(AGENT_READY_FILE):
+            os.remove(AGENT_READY_FILE)
+        await super().shutdown(sockets)
+
+
+def serve(app, port: int, ready: Optional[Callable[[], Awaitable[None]]] = None) -> None:
+    if AGENT_UDS_PATH:
+        if os.path.exists(AGENT_UDS_PATH):
+            # Left behind by a previous run that didn't shut down cleanly
+            os.remove(AGENT_UDS_PATH)
+        config = uvicorn.Config(app, uds=AGENT_UDS_PATH)
+    else:
+        config = uvicorn.Config(app, host="0.0.0.0", port=port)
+    ReadyServer(config, ready=ready).run()
@@ -0,0 +1,387 @@
+import json
+import logging
+import os
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, InMemorySessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+from google.adk.sessions.state import State
+from google.genai import types
+
+from common.visitors import DAILY_TOKEN_PREFIX
+
+logger = logging.getLogger(__name__)
+
+# Cap on the estimated memory held by sessions (Python objects, not their serialized size)
+SESSION_MEMORY_CAP_MB = float(os.getenv("SESSION_MEMORY_CAP_MB", "512"))
+# Ratio of in-memory size to JSON size for events and state; ~5x measured with tracemalloc on ADK 1.23
+SESSION_MEMORY_OVERHEAD = float(os.getenv("SESSION_MEMORY_OVERHEAD", "5"))
+# Compact a session once it holds this many events, keeping the most recent ones verbatim
+SESSION_COMPACT_AFTER_EVENTS = int(os.getenv("SESSION_COMPACT_AFTER_EVENTS", "60"))
+SESSION_KEEP_RECENT_EVENTS = int(os.getenv("SESSION_KEEP_RECENT_EVENTS", "20"))
+# Characters kept from each event when it is folded into a compaction summary
+SESSION_SUMMARY_CHARS_PER_EVENT = int(os.getenv("SESSION_SUMMARY_CHARS_PER_EVENT", "200"))
+# Longest a compaction summary may grow; the oldest lines are dropped beyond it
+SESSION_SUMMARY_MAX_CHARS = int(os.getenv("SESSION_SUMMARY_MAX_CHARS", "4000"))
+SESSION_SHARDS = int(os.getenv("SESSION_SHARDS", "8"))
+# Oldest session of a visitor is dropped when they open more than this many
+USER_MAX_SESSIONS = int(os.getenv("USER_MAX_SESSIONS", "5"))
+
+SUMMARY_HEADER = "Summary of earlier conversation:"
+
+SessionKey = Tuple[str, str, str]
+
+# Daily token counters as stored in user_state, which holds user keys without their prefix
+_DAILY_TOKEN_STATE_PREFIX = DAILY_TOKEN_PREFIX[len(State.USER_PREFIX):]
+
+
+def _event_bytes(event: Event) -> int:
+    """Estimated memory held by `event`: its JSON size scaled by SESSION_MEMORY_OVERHEAD."""
+    return int(len(event.model_dump_json(exclude_none=True)) * SESSION_MEMORY_OVERHEAD)
+
+
+def _state_bytes(state: Dict[str, Any]) -> int:
+    return int(len(json.dumps(state, default=str)) * SESSION_MEMORY_OVERHEAD)
+
+
+def _is_summary(event: Event) -> bool:
+    return bool(event.custom_metadata and event.custom_metadata.get("session_summary"))
+
+
+def _event_text(event: Event) -> str:
+    content = event.content
+    if event.actions and event.actions.compaction:
+        content = event.actions.compaction.compacted_content
+    if not content or not content.parts:
+        return ""
+    chunks = []
+    for part in content.parts:
+        if part.text and not part.thought:
+            chunks.append(part.text)
+        elif part.function_call:
+            chunks.append(f"[called {part.function_call.name}]")
+    return " ".join(chunks).strip()
+
+
+class BoundedInMemorySessionService(InMemorySessionService):
+    """In-memory session service that tracks per-session bytes and keeps the total under a cap.
+
+    Long sessions are compacted by folding old events into a single bounded summary event,
+    and when the global cap is still exceeded the largest, idlest sessions are evicted.
+    With `memory_cap_bytes=None` nothing is evicted here; the owner enforces the cap.
+    """
+
+    def __init__(
+        self,
+        memory_cap_bytes: Optional[int] = int(SESSION_MEMORY_CAP_MB * 1024 * 1024),
+        max_sessions_per_user: Optional[int] = USER_MAX_SESSIONS,
+    ):
+        super().__init__()
+        self.memory_cap_bytes = memory_cap_bytes
+        self.max_sessions_per_user = max_sessions_per_user
+        self._event_bytes: Dict[SessionKey, int] = {}
+        self._state_bytes: Dict[SessionKey, int] = {}
+        # Running sum of both maps, kept in step by _set_bytes and _forget
+        self.total_bytes = 0
+        # Least recently used first
+        self._last_access: "OrderedDict[SessionKey, float]" = OrderedDict()
+        self.evictions = 0
+        self.compactions = 0
+
+    def session_bytes(self, key: SessionKey) -> int:
+        return self._event_bytes.get(key, 0) + self._state_bytes.get(key, 0)
+
+    def _touch(self, key: SessionKey) -> None:
+        self._last_access[key] = time.time()
+        self._last_access.move_to_end(key)
+
+    def _set_bytes(self, key: SessionKey, events: Optional[int] = None, state: Optional[int] = None) -> None:
+        if events is not None:
+            self.total_bytes += events - self._event_bytes.get(key, 0)
+            self._event_bytes[key] = events
+        if state is not None:
+            self.total_bytes += state - self._state_bytes.get(key, 0)
+            self._state_bytes[key] = state
+
+    def _forget(self, key: SessionKey) -> None:
+        self.total_bytes -= self._event_bytes.pop(key, 0) + self._state_bytes.pop(key, 0)
+        self._last_access.pop(key, None)
+
+    def _drop(self, key: SessionKey) -> None:
+        """Delete a session without a caller; the user's state goes with their last session."""
+        app_name, user_id, session_id = key
+        self._delete_session_impl(app_name=app_name, user_id=user_id, session_id=session_id)
+        self._forget(key)
+        self._drop_user_if_gone(app_name, user_id)
+
+    def _drop_user_if_gone(self, app_name: str, user_id: str) -> None:
+        if self.sessions.get(app_name, {}).get(user_id):
+            return
+        self.sessions.get(app_name, {}).pop(user_id, None)
+        self.user_state.get(app_name, {}).pop(user_id, None)
+
+    def _prune_daily_tokens(self, app_name: str, user_id: str, event: Event) -> None:
+        """Keep only the day's token counter just written, dropping those of earlier days."""
+        current = [key for key in event.actions.state_delta if key.startswith(DAILY_TOKEN_PREFIX)]
+        user_state = self.user_state.get(app_name, {}).get(user_id)
+        if not current or not user_state:
+            return
+        keep = current[-1][len(State.USER_PREFIX):]
+        for key in [key for key in user_state if key.startswith(_DAILY_TOKEN_STATE_PREFIX) and key != keep]:
+            del user_state[key]
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        user_sessions = self.sessions.get(app_name, {}).get(user_id, {})
+        if self.max_sessions_per_user and len(user_sessions) >= self.max_sessions_per_user:
+            oldest = next((key for key in self._last_access if key[:2] == (app_name, user_id)), None)
+        else:
+            oldest = None
+        if oldest:
+            self._delete_session_impl(app_name=app_name, user_id=user_id, session_id=oldest[2])
+            self._forget(oldest)
+            logger.info(f"User {user_id} hit {self.max_sessions_per_user} sessions, dropped {oldest[2]}")
+        session = await super().create_session(
+            app_name=app_name, user_id=user_id, state=state, session_id=session_id
+        )
+        key = (app_name, user_id, session.id)
+        self._set_bytes(key, events=0, state=_state_bytes(session.state))
+        self._touch(key)
+        return session
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        session = await super().get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=config
+        )
+        if session is not None:
+            self._touch((app_name, user_id, session_id))
+        return session
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        await super().delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        self._forget((app_name, user_id, session_id))
+        self._drop_user_if_gone(app_name, user_id)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session=session, event=event)
+        if event.partial:
+            return event
+
+        key = (session.app_name, session.user_id, session.id)
+        storage_session = self.sessions.get(session.app_name, {}).get(session.user_id, {}).get(session.id)
+        if storage_session is None:
+            return event
+
+        self._set_bytes(key, events=self._event_bytes.get(key, 0) + _event_bytes(event))
+        if event.actions and event.actions.state_delta:
+            self._set_bytes(key, state=_state_bytes(storage_session.state))
+            self._prune_daily_tokens(session.app_name, session.user_id, event)
+        self._touch(key)
+
+        if len(storage_session.events) >= SESSION_COMPACT_AFTER_EVENTS:
+            self._compact(key, storage_session)
+        if self.memory_cap_bytes is not None and self.total_bytes > self.memory_cap_bytes:
+            self._evict(protect=key)
+        return event
+
+    def _compact(self, key: SessionKey, storage_session: Session) -> None:
+        """Fold all but the most recent events into one compaction summary event."""
+        events = storage_session.events
+        cut = len(events) - SESSION_KEEP_RECENT_EVENTS
+        # Cut on a user turn so function call/response pairs are never split
+        while cut > 0 and events[cut].author != "user":
+            cut -= 1
+        if cut <= 1:
+            return
+
+        old_events, recent_events = events[:cut], events[cut:]
+        lines = []
+        for event in old_events:
+            text = _event_text(event)
+            if _is_summary(event) or (event.actions and event.actions.compaction):
+                # Carry an earlier summary's lines forward, without its header
+                lines.extend(line for line in text.splitlines() if line and line != SUMMARY_HEADER)
+            elif text:
+                lines.append(f"{event.author}: {text[:SESSION_SUMMARY_CHARS_PER_EVENT]}")
+        # Bound the summary so a long-running session stops growing: oldest lines go first
+        size = sum(len(line) + 1 for line in lines)
+        while len(lines) > 1 and size > SESSION_SUMMARY_MAX_CHARS:
+            size -= len(lines.pop(0)) + 1
+        # A plain event authored by the agent, so ADK replays it as the assistant's own
+        # history. ADK renders EventCompaction summaries as "[model] said" user context.
+        author = next((event.author for event in reversed(old_events) if event.author != "user"), "model")
+        summary = Event(
+            author=author,
+            invocation_id=old_events[-1].invocation_id,
+            timestamp=old_events[-1].timestamp,
+            content=types.Content(
+                role="model",
+                parts=[types.Part(text=SUMMARY_HEADER + "\n" + "\n".join(lines))],
+            ),
+            custom_metadata={"session_summary": True},
+        )
+        storage_session.events = [summary, *recent_events]
+        before = self._event_bytes.get(key, 0)
+        self._set_bytes(key, events=sum(_event_bytes(event) for event in storage_session.events))
+        self.compactions += 1
+        logger.info(
+            f"Compacted session {key[2]}: {len(old_events)} events folded, "
+            f"{before} -> {self._event_bytes[key]} bytes"
+        )
+
+    def eviction_scores(self, now: float, protect: Optional[SessionKey] = None) -> List[Tuple[float, SessionKey]]:
+        """Score every session but `protect` for eviction; the highest score goes first."""
+        # Weight size by idle time so a big session in active use outlives a small abandoned one
+        return [
+            (self.session_bytes(key) * (now - last_access + 1), key)
+            for key, last_access in self._last_access.items()
+            if key != protect
+        ]
+
+    def evict(self, key: SessionKey) -> None:
+        freed = self.session_bytes(key)
+        self._drop(key)
+        self.evictions += 1
+        logger.warning(f"Evicted session {key[2]} ({freed} bytes) to stay under memory cap")
+
+    def _evict(self, protect: SessionKey) -> None:
+        """Drop sessions, largest and idlest first, until total usage is back under the cap."""
+        for _, key in sorted(self.eviction_scores(time.time(), protect), reverse=True):
+            if self.total_bytes <= self.memory_cap_bytes:
+                break
+            self.evict(key)
+
+    def top_sessions(self, limit: int = 10) -> List[Dict[str, Any]]:
+        now = time.time()
+        keys = sorted(self._last_access, key=self.session_bytes, reverse=True)[:limit]
+        result = []
+        for app_name, user_id, session_id in keys:
+            key = (app_name, user_id, session_id)
+            storage_session = self.sessions.get(app_name, {}).get(user_id, {}).get(session_id)
+            result.append({
+                "session_id": session_id,
+                "user_id": user_id,
+                "bytes": self.session_bytes(key),
+                "events": len(storage_session.events) if storage_session else 0,
+                "idle_seconds": round(now - self._last_access[key], 1),
+            })
+        return result
+
+    def snapshot(self, limit: int = 10) -> Dict[str, Any]:
+        return {
+            "total_bytes": self.total_bytes,
+            "cap_bytes": self.memory_cap_bytes,
+            "sessions": len(self._last_access),
+            "compactions": self.compactions,
+            "evictions": self.evictions,
+            "top_sessions": self.top_sessions(limit),
+        }
+
+
+class ShardedSessionService(BaseSessionService):
+    """Spreads sessions over independent BoundedInMemorySessionService shards keyed by user ID.
+
+    Each visitor's sessions live in one small shard, so lookups and per-user listings never
+    walk every session in the pod. The memory cap is one pod-wide budget: when the summed
+    total exceeds it, sessions are evicted across all shards, largest and idlest first.
+    """
+
+    def __init__(self, shards: int = SESSION_SHARDS, memory_cap_bytes: int = int(SESSION_MEMORY_CAP_MB * 1024 * 1024)):
+        self.memory_cap_bytes = memory_cap_bytes
+        self.shards = [BoundedInMemorySessionService(memory_cap_bytes=None) for _ in range(shards)]
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(shard.total_bytes for shard in self.shards)
+
+    def shard_for(self, user_id: str) -> BoundedInMemorySessionService:
+        return self.shards[zlib.crc32(user_id.encode()) % len(self.shards)]
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        return await self.shard_for(user_id).create_session(
+            app_name=app_name, user_id=user_id, state=state, session_id=session_id
+        )
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        return await self.shard_for(user_id).get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=config
+        )
+
+    async def list_sessions(self, *, app_name: str, user_id: Optional[str] = None) -> ListSessionsResponse:
+        if user_id is not None:
+            return await self.shard_for(user_id).list_sessions(app_name=app_name, user_id=user_id)
+        sessions = []
+        for shard in self.shards:
+            sessions.extend((await shard.list_sessions(app_name=app_name)).sessions)
+        return ListSessionsResponse(sessions=sessions)
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        await self.shard_for(user_id).delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await self.shard_for(session.user_id).append_event(session=session, event=event)
+        if not event.partial and self.total_bytes > self.memory_cap_bytes:
+            self._evict(protect=(session.app_name, session.user_id, session.id))
+        return event
+
+    def _evict(self, protect: SessionKey) -> None:
+        """Drop sessions from any shard, largest and idlest first, until back under the cap."""
+        now = time.time()
+        candidates = sorted(
+            ((score, key, shard) for shard in self.shards for score, key in shard.eviction_scores(now, protect)),
+            key=lambda candidate: candidate[0],
+            reverse=True,
+        )
+        total = self.total_bytes
+        for _, key, shard in candidates:
+            if total <= self.memory_cap_bytes:
+                break
+            total -= shard.session_bytes(key)
+            shard.evict(key)
+
+    def snapshot(self, limit: int = 10) -> Dict[str, Any]:
+        top = sorted(
+            (entry for shard in self.shards for entry in shard.top_sessions(limit)),
+            key=lambda entry: entry["bytes"],
+            reverse=True,
+        )[:limit]
+        return {
+            "total_bytes": self.total_bytes,
+            "cap_bytes": self.memory_cap_bytes,
+            "sessions": sum(len(shard._last_access) for shard in self.shards),
+            "shards": [len(shard._last_access) for shard in self.shards],
+            "compactions": sum(shard.compactions for shard in self.shards),
+            "evictions": sum(shard.evictions for shard in self.shards),
+            "top_sessions": top,
+        }
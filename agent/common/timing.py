@@ -0,0 +1,134 @@
+import functools
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+# perf_counter() at which the HTTP request reached the app, used for the queue phase
+request_started_at: ContextVar[Optional[float]] = ContextVar("request_started_at", default=None)
+
+RECENT_TIMINGS_LIMIT = 256
+# Invocations that never reach a final model response (errors, cancellations) are dropped past this
+LIVE_TIMERS_LIMIT = 1024
+
+
+class RequestStartMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        request_started_at.set(time.perf_counter())
+        return await call_next(request)
+
+
+class PhaseTimer:
+    """Accumulates per-phase wall time (ms) for one invocation; a turn may make several model and tool calls."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        request_start = request_started_at.get()
+        if request_start is not None:
+            self.phases["queue"] = (self.started - request_start) * 1000
+        self._model_call_started: Optional[float] = None
+        self._first_chunk: Optional[float] = None
+        self._tools: Dict[str, float] = {}
+
+    def add(self, phase: str, started: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + (time.perf_counter() - started) * 1000
+
+    def model_call_started(self) -> None:
+        self._model_call_started = time.perf_counter()
+        self._first_chunk = None
+
+    def model_chunk(self, final: bool) -> None:
+        if self._model_call_started is None:
+            return
+        if self._first_chunk is None:
+            self._first_chunk = time.perf_counter()
+            self.add("ttft", self._model_call_started)
+        if final:
+            self.add("decode", self._first_chunk)
+            self._model_call_started = None
+
+    def tool_started(self, call_id: str) -> None:
+        self._tools[call_id] = time.perf_counter()
+
+    def tool_finished(self, call_id: str) -> None:
+        started = self._tools.pop(call_id, None)
+        if started is not None:
+            self.add("tool", started)
+
+    def summary(self) -> Dict[str, float]:
+        summary = {phase: round(ms, 1) for phase, ms in self.phases.items()}
+        summary["total"] = round((time.perf_counter() - self.started) * 1000 + self.phases.get("queue", 0.0), 1)
+        return summary
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """Render a timings dict as a Server-Timing header value."""
+    return ", ".join(f"{phase};dur={ms}" for phase, ms in timings.items())
+
+
+class PhaseTimers:
+    """Live timers by invocation ID plus the last finished breakdown per session."""
+
+    def __init__(self):
+        self._live: Dict[str, PhaseTimer] = {}
+        self.recent: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+
+    def start(self, invocation_id: str) -> PhaseTimer:
+        timer = self._live[invocation_id] = PhaseTimer()
+        while len(self._live) > LIVE_TIMERS_LIMIT:
+            self._live.pop(next(iter(self._live)))
+        return timer
+
+    def get(self, invocation_id: str) -> PhaseTimer:
+        # Callbacks can fire without before_agent (e.g. resumed tool calls); start lazily
+        return self._live.get(invocation_id) or self.start(invocation_id)
+
+    def finish(self, invocation_id: str, session_id: str) -> Dict[str, float]:
+        timer = self._live.pop(invocation_id, None)
+        timings = timer.summary() if timer else {}
+        self.recent[session_id] = timings
+        self.recent.move_to_end(session_id)
+        while len(self.recent) > RECENT_TIMINGS_LIMIT:
+            self.recent.popitem(last=False)
+        return timings
+
+
+phase_timers = PhaseTimers()
+
+
+def _context(args: tuple, kwargs: Dict[str, Any]) -> Any:
+    return kwargs.get("callback_context") or kwargs.get("tool_context") or (args[0] if args else None)
+
+
+def timed_callback(phase: str) -> Callable:
+    """Add the wall time of an agent callback to `phase` on the invocation's PhaseTimer.
+
+    before_model also marks the start of the model call (for TTFT), and after_model marks
+    each streamed chunk and closes the timer once the invocation is ending.
+    """
+    def decorator(callback: Callable) -> Callable:
+        @functools.wraps(callback)
+        def wrapper(*args, **kwargs):
+            context = _context(args, kwargs)
+            invocation_id = context.invocation_id
+            timer = phase_timers.start(invocation_id) if phase == "before_agent" else phase_timers.get(invocation_id)
+            if phase == "after_model":
+                llm_response = kwargs.get("llm_response") or args[1]
+                timer.model_chunk(final=not llm_response.partial)
+
+            started = time.perf_counter()
+            result = callback(*args, **kwargs)
+            timer.add(phase, started)
+
+            if phase == "before_model" and result is None:
+                timer.model_call_started()
+            elif phase == "after_model" and context._invocation_context.end_invocation:
+                timings = phase_timers.finish(invocation_id, context.session.id)
+                context.state["timings"] = timings
+            return result
+        return wrapper
+    return decorator
@@ -1,25 +1,23 @@
-from google.adk.tools.mcp_tool import McpToolset, StdioConnectionParams, StreamableHTTPConnectionParams
-from mcp.client.stdio import StdioServerParameters
+import os
+
+from common.mcp_pool import McpProcessPool, PooledMcpServer, server_params
 
 
 # Create memory MCP toolset for knowledge graph memory
-memory_toolset = McpToolset(
-    connection_params=StdioConnectionParams(
-       timeout=120,
-        server_params=StdioServerParameters(
-            command='npx',
-            args=["-y", "@modelcontextprotocol/server-memory"],
-        ),
-    ),
+memory_toolset = PooledMcpServer(
+    name="memory",
+    params=server_params("@modelcontextprotocol/server-memory"),
 )
 
 
-filesystem_toolset = McpToolset(
-    connection_params=StdioConnectionParams(
-       timeout=120,
-        server_params=StdioServerParameters(
-            command='npx',
-            args=["-y", "@modelcontextprotocol/server-filesystem", "/home/bharath/workspace/profile_agent"],
-        ),
+filesystem_toolset = PooledMcpServer(
+    name="filesystem",
+    params=server_params(
+        "@modelcontextprotocol/server-filesystem",
+        [os.getenv("MCP_FILESYSTEM_ROOT", "/home/bharath/workspace/profile_agent")],
     ),
-)
\ No newline at end of file
+)
+
+
+# Shared by every session; started and health-checked from the app lifespan in main.py
+mcp_pool = McpProcessPool([memory_toolset, filesystem_toolset])
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from ag_ui.core import EventType, RunAgentInput, RunErrorEvent
+from ag_ui.encoder import EventEncoder
+from ag_ui_adk import ADKAgent
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+class _Turn:
+    def __init__(self):
+        self.started = time.perf_counter()
+        # The task running the ADK agent for this turn, bound from before_agent
+        self.task: Optional[asyncio.Task] = None
+        self.completed = False
+        self.cancelled = False
+        self.cancel_reason: Optional[str] = None
+
+
+class TurnManager:
+    """Runs at most one turn per session and cancels generations nobody will read.
+
+    A new message on a session supersedes the turn still running there, and a client
+    disconnect abandons it; either way the ADK task is cancelled, which closes the
+    upstream streaming request and stops the model from generating further tokens.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._lock_users: Dict[str, int] = {}
+        self._turns: Dict[str, _Turn] = {}
+        self._avg_turn_seconds = 0.0
+        self.stats: Dict[str, float] = {
+            "turns": 0,
+            "completed": 0,
+            "superseded": 0,
+            "abandoned": 0,
+            "cancelled_seconds": 0.0,
+            "estimated_seconds_saved": 0.0,
+        }
+
+    @asynccontextmanager
+    async def turn(self, session_id: str) -> AsyncIterator[_Turn]:
+        self.cancel(session_id, "superseded")
+        lock = self._locks.setdefault(session_id, asyncio.Lock())
+        self._lock_users[session_id] = self._lock_users.get(session_id, 0) + 1
+        try:
+            async with lock:
+                turn = self._turns[session_id] = _Turn()
+                self.stats["turns"] += 1
+                try:
+                    yield turn
+                finally:
+                    if turn.completed and not turn.cancelled:
+                        self._record_completed(turn)
+                    if self._turns.get(session_id) is turn:
+                        del self._turns[session_id]
+        finally:
+            self._lock_users[session_id] -= 1
+            if not self._lock_users[session_id]:
+                del self._lock_users[session_id]
+                del self._locks[session_id]
+
+    def bind(self, session_id: str) -> None:
+        """Associate the current task (the ADK run) with the session's active turn."""
+        turn = self._turns.get(session_id)
+        if turn is not None and turn.task is None:
+            turn.task = asyncio.current_task()
+            if turn.cancelled:
+                # Superseded or abandoned before the run started: don't generate at all
+                turn.task.cancel()
+
+    def cancel(self, session_id: str, reason: str) -> None:
+        turn = self._turns.get(session_id)
+        if turn is None or turn.completed or turn.cancelled:
+            return
+        turn.cancelled = True
+        turn.cancel_reason = reason
+        elapsed = time.perf_counter() - turn.started
+        self.stats[reason] += 1
+        self.stats["cancelled_seconds"] += elapsed
+        # Compute saved is what an average turn would still have spent generating
+        self.stats["estimated_seconds_saved"] += max(0.0, self._avg_turn_seconds - elapsed)
+        if turn.task is not None and not turn.task.done():
+            turn.task.cancel()
+        logger.info(f"Cancelled {reason} turn for session {session_id} after {elapsed:.2f}s")
+
+    def _record_completed(self, turn: _Turn) -> None:
+        duration = time.perf_counter() - turn.started
+        self.stats["completed"] += 1
+        # Exponential moving average, seeded by the first turn
+        if self._avg_turn_seconds == 0.0:
+            self._avg_turn_seconds = duration
+        else:
+            self._avg_turn_seconds = 0.9 * self._avg_turn_seconds + 0.1 * duration
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **{key: round(value, 2) for key, value in self.stats.items()},
+            "avg_turn_seconds": round(self._avg_turn_seconds, 2),
+            "active_turns": len(self._turns),
+        }
+
+
+turn_manager = TurnManager()
+
+
+async def _watch_disconnect(request: Request, session_id: str) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+    turn_manager.cancel(session_id, "abandoned")
+
+
+def add_turn_managed_endpoint(app: FastAPI, agent: ADKAgent, path: str = "/") -> None:
+    """AG-UI endpoint like ag_ui_adk.add_adk_fastapi_endpoint, with turns serialized per session."""
+
+    @app.post(path)
+    async def adk_endpoint(input_data: RunAgentInput, request: Request):
+        encoder = EventEncoder(accept=request.headers.get("accept"))
+        session_id = input_data.thread_id
+
+        async def event_generator():
+            async with turn_manager.turn(session_id) as turn:
+                watcher = asyncio.create_task(_watch_disconnect(request, session_id))
+                try:
+                    async for event in agent.run(input_data):
+                        yield encoder.encode(event)
+                    turn.completed = True
+                except asyncio.CancelledError:
+                    # The ADK task was cancelled under the run (ag_ui_adk re-raises its CancelledError).
+                    # Close the stream with a terminal event unless this response itself is being cancelled.
+                    if not turn.cancelled or asyncio.current_task().cancelling():
+                        raise
+                    yield encoder.encode(
+                        RunErrorEvent(
+                            type=EventType.RUN_ERROR,
+                            message=f"Turn {turn.cancel_reason}",
+                            code=f"TURN_{turn.cancel_reason.upper()}",
+                        )
+                    )
+                except Exception as e:
+                    logger.error(f"ADKAgent error: {e}", exc_info=True)
+                    yield encoder.encode(
+                        RunErrorEvent(type=EventType.RUN_ERROR, message=f"Agent execution failed: {e}", code="AGENT_ERROR")
+                    )
+                finally:
+                    watcher.cancel()
+                    # Stream closed before the run finished: the client went away mid-generation
+                    turn_manager.cancel(session_id, "abandoned")
+
+        return StreamingResponse(event_generator(), media_type=encoder.get_content_type())
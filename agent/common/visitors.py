@@ -0,0 +1,43 @@
+import os
+import re
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+from ag_ui.core import RunAgentInput
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+VISITOR_HEADER = "x-visitor-id"
+VISITOR_COOKIE = "visitor_id"
+# Tokens a single visitor may spend per UTC day across all their sessions (0 disables the limit)
+USER_TOKEN_LIMIT = int(os.getenv("USER_TOKEN_LIMIT", "200000"))
+# User-scoped state keys counting a day's tokens, suffixed with the UTC date
+DAILY_TOKEN_PREFIX = "user:tokens_"
+
+_VALID_VISITOR_ID = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+# Set per request by VisitorIdMiddleware and read when ADKAgent resolves the user ID
+current_visitor_id: ContextVar[Optional[str]] = ContextVar("current_visitor_id", default=None)
+
+
+def daily_token_key() -> str:
+    """User-scoped state key counting today's tokens (UTC), so the quota resets each day."""
+    return f"{DAILY_TOKEN_PREFIX}{datetime.now(timezone.utc):%Y-%m-%d}"
+
+
+class VisitorIdMiddleware(BaseHTTPMiddleware):
+    """Pick up the visitor ID forwarded by the Next.js route (header first, then cookie)."""
+
+    async def dispatch(self, request: Request, call_next):
+        visitor_id = request.headers.get(VISITOR_HEADER) or request.cookies.get(VISITOR_COOKIE)
+        current_visitor_id.set(visitor_id if visitor_id and _VALID_VISITOR_ID.match(visitor_id) else None)
+        return await call_next(request)
+
+
+def visitor_user_id(input: RunAgentInput) -> str:
+    """ADKAgent user_id_extractor: one user per visitor, falling back to one per thread."""
+    visitor_id = current_visitor_id.get()
+    if visitor_id:
+        return f"visitor_{visitor_id}"
+    return f"thread_user_{input.thread_id}"
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from google.adk.models import BaseLlm, LlmRequest
+from google.genai import types
+
+from common.cassette import LLM_CASSETTE_MODE
+from common.custom_agent import build_model, resolve_model_name, use_litellm
+
+logger = logging.getLogger(__name__)
+
+# On by default only for self-hosted backends (USE_LITELLM); hosted Gemini has no model to load
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", str(use_litellm)).lower() == "true"
+# Re-send the warmup request this often so an idle backend keeps the model loaded; 0 disables
+WARMUP_INTERVAL_SECONDS = float(os.getenv("WARMUP_INTERVAL_SECONDS", "0"))
+
+
+class ModelWarmer:
+    """Loads each model on the backend and fills its prefix cache with the system prompt.
+
+    Sends a one-token request carrying `system_instruction` to every model the router can
+    pick, retrying in the background with backoff until each succeeds. The server keeps
+    serving meanwhile; wait_ready() gates only the readiness report.
+    """
+
+    def __init__(self, model_names: Iterable[str], system_instruction: str):
+        self.system_instruction = system_instruction
+        names = dict.fromkeys(resolve_model_name(name) for name in model_names)
+        self.models: Dict[str, BaseLlm] = {name: build_model(name) for name in names}
+        self._warm_task: Optional[asyncio.Task] = None
+        self._keep_warm_task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        self.stats: Dict[str, Dict[str, Any]] = {
+            name: {"warmups": 0, "failures": 0, "first_s": None, "last_s": None, "last_at": None}
+            for name in self.models
+        }
+
+    def _request(self, name: str) -> LlmRequest:
+        return LlmRequest(
+            model=self.models[name].model,
+            contents=[types.Content(role="user", parts=[types.Part(text="Hi")])],
+            config=types.GenerateContentConfig(
+                system_instruction=self.system_instruction,
+                max_output_tokens=1,
+            ),
+        )
+
+    async def warm_one(self, name: str) -> float:
+        started = time.perf_counter()
+        async for _ in self.models[name].generate_content_async(self._request(name)):
+            pass
+        latency = time.perf_counter() - started
+        stats = self.stats[name]
+        stats["warmups"] += 1
+        stats["first_s"] = stats["first_s"] if stats["first_s"] is not None else round(latency, 3)
+        stats["last_s"] = round(latency, 3)
+        stats["last_at"] = time.time()
+        return latency
+
+    @property
+    def enabled(self) -> bool:
+        return WARMUP_ENABLED and LLM_CASSETTE_MODE != "replay"
+
+    async def warm(self) -> None:
+        """Warm every model, retrying each until it answers."""
+        for name in self.models:
+            attempt = 0
+            while True:
+                try:
+                    latency = await self.warm_one(name)
+                    print(f"Warmed {name} in {latency:.2f}s")
+                    break
+                except Exception as e:
+                    self.stats[name]["failures"] += 1
+                    delay = min(2 ** attempt, 30) * random.uniform(0.5, 1.0)
+                    attempt += 1
+                    logger.warning(f"Warmup of {name} failed ({e!r}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+        self._ready.set()
+
+    def start(self) -> None:
+        """Warm up in the background, then keep the models warm if WARMUP_INTERVAL_SECONDS is set."""
+        if not self.enabled:
+            self._ready.set()
+            return
+        self._warm_task = asyncio.create_task(self.warm())
+        if WARMUP_INTERVAL_SECONDS > 0:
+            self._keep_warm_task = asyncio.create_task(self._keep_warm())
+
+    async def wait_ready(self) -> None:
+        await self._ready.wait()
+
+    async def _keep_warm(self) -> None:
+        await self._ready.wait()
+        while True:
+            await asyncio.sleep(WARMUP_INTERVAL_SECONDS)
+            for name in self.models:
+                try:
+                    await self.warm_one(name)
+                except Exception as e:
+                    self.stats[name]["failures"] += 1
+                    logger.warning(f"Keep-warm request to {name} failed: {e!r}")
+
+    async def stop(self) -> None:
+        for task in (self._warm_task, self._keep_warm_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._warm_task = self._keep_warm_task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "ready": self._ready.is_set(),
+            "interval_s": WARMUP_INTERVAL_SECONDS,
+            "models": self.stats,
+        }
@@ -0,0 +1,164 @@
+"""Run a JSONL file of recruiter questions through BharathAssistant and record per-question metrics.
+
+Usage:
+    python evaluate.py eval_questions.jsonl --output results.jsonl --concurrency 4
+
+Each input line needs a `question` (or `prompt` / `body`) field and may carry an `id`.
+Every question runs in its own session, so results are independent of each other.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from typing import Any, Dict, List
+
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from common.custom_agent import model, use_litellm
+from main import profile_agent
+
+APP_NAME = "BharathAssistantEval"
+
+
+def load_questions(path: str, limit: int | None = None) -> List[Dict[str, str]]:
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            text = record.get("question") or record.get("prompt") or record.get("body")
+            if not text:
+                print(f"Skipping line {line_no}: no question/prompt/body field")
+                continue
+            questions.append({"id": str(record.get("id") or record.get("request_id") or line_no), "question": text})
+    return questions[:limit] if limit else questions
+
+
+async def run_question(runner: Runner, session_service: InMemorySessionService, item: Dict[str, str]) -> Dict[str, Any]:
+    # A user per question: user-scoped state (the daily token quota) must not carry across questions
+    user_id = f"eval_{uuid.uuid4().hex}"
+    session = await session_service.create_session(app_name=APP_NAME, user_id=user_id, session_id=str(uuid.uuid4()))
+    message = types.Content(role="user", parts=[types.Part(text=item["question"])])
+    result: Dict[str, Any] = {
+        "id": item["id"],
+        "question": item["question"],
+        "answer": "",
+        "latency_s": None,
+        "ttft_s": None,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "backend": "litellm" if use_litellm else "gemini",
+        "tier": None,
+        "model": model.model,
+        "thinking_budget": None,
+        "error": None,
+    }
+
+    started = time.perf_counter()
+    try:
+        async for event in runner.run_async(
+            user_id=user_id,
+            session_id=session.id,
+            new_message=message,
+            run_config=RunConfig(streaming_mode=StreamingMode.SSE),
+        ):
+            if event.author == profile_agent.name and event.content and result["ttft_s"] is None:
+                # First streamed chunk from the model; intermediate text is blanked by the after-model callback
+                result["ttft_s"] = round(time.perf_counter() - started, 3)
+            if event.usage_metadata and not event.partial:
+                result["prompt_tokens"] += event.usage_metadata.prompt_token_count or 0
+                result["completion_tokens"] += event.usage_metadata.candidates_token_count or 0
+            if event.is_final_response() and event.content and event.content.parts:
+                result["answer"] = "".join(part.text or "" for part in event.content.parts if not part.thought)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["latency_s"] = round(time.perf_counter() - started, 3)
+
+    # The route the router picked for this question (see before_model_modifier)
+    session = await session_service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session.id)
+    route = session.state.get("route") if session else None
+    if route:
+        result["tier"] = route["tier"]
+        result["model"] = route["model"]
+        result["thinking_budget"] = route["thinking_budget"]
+    return result
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def print_summary(results: List[Dict[str, Any]], wall_time: float) -> None:
+    ok = [r for r in results if not r["error"]]
+    latencies = [r["latency_s"] for r in ok]
+    ttfts = [r["ttft_s"] for r in ok if r["ttft_s"] is not None]
+    prompt_tokens = sum(r["prompt_tokens"] for r in ok)
+    completion_tokens = sum(r["completion_tokens"] for r in ok)
+    rows = [
+        ("backend", results[0]["backend"] if results else "-"),
+        ("questions", f"{len(results)} ({len(results) - len(ok)} errors)"),
+        ("wall time", f"{wall_time:.2f}s"),
+        ("throughput", f"{len(ok) / wall_time:.2f} q/s, {completion_tokens / wall_time:.1f} completion tok/s" if wall_time else "-"),
+        ("latency p50/p95", f"{percentile(latencies, 50):.2f}s / {percentile(latencies, 95):.2f}s"),
+        ("ttft mean/p95", f"{statistics.mean(ttfts):.2f}s / {percentile(ttfts, 95):.2f}s" if ttfts else "-"),
+        ("prompt tokens", f"{prompt_tokens} ({prompt_tokens // max(len(ok), 1)} per question)"),
+        ("completion tokens", f"{completion_tokens} ({completion_tokens // max(len(ok), 1)} per question)"),
+    ]
+    for tier in sorted({r["tier"] for r in ok if r["tier"]}):
+        routed = [r for r in ok if r["tier"] == tier]
+        tier_latencies = [r["latency_s"] for r in routed]
+        rows.append((
+            f"tier {tier}",
+            f"{len(routed)} q on {routed[0]['model']}, latency p50 {percentile(tier_latencies, 50):.2f}s, "
+            f"{sum(r['completion_tokens'] for r in routed) // len(routed)} completion tok/q",
+        ))
+    width = max(len(label) for label, _ in rows)
+    print()
+    for label, value in rows:
+        print(f"{label.ljust(width)}  {value}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    questions = load_questions(args.input, args.limit)
+    session_service = InMemorySessionService()
+    runner = Runner(app_name=APP_NAME, agent=profile_agent, session_service=session_service)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(item: Dict[str, str]) -> Dict[str, Any]:
+        async with semaphore:
+            result = await run_question(runner, session_service, item)
+            status = result["error"] or f"{result['latency_s']}s"
+            print(f"[{result['id']}] {status}")
+            return result
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(bounded(item) for item in questions))
+    wall_time = time.perf_counter() - started
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        for result in results:
+            f.write(json.dumps(result) + "\n")
+    print(f"Wrote {len(results)} results to {args.output}")
+    print_summary(results, wall_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file of questions")
+    parser.add_argument("--output", default="eval_results.jsonl", help="Where to write per-question results")
+    parser.add_argument("--concurrency", type=int, default=4, help="Questions in flight at once")
+    parser.add_argument("--limit", type=int, default=None, help="Only run the first N questions")
+    asyncio.run(main(parser.parse_args()))
@@ -4,12 +4,14 @@ from __future__ import annotations
 
 import json
 import time
-from typing import Dict, Optional
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from typing import Any, Dict, Optional
 
-from ag_ui_adk import ADKAgent, add_adk_fastapi_endpoint
+from ag_ui_adk import ADKAgent
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 import litellm
 from google.adk.agents import LlmAgent, Agent
@@ -25,7 +27,15 @@ from langfuse import get_client
 from openinference.instrumentation.google_adk import GoogleADKInstrumentor
 from common.custom_agent import CustomAgent
 from google.adk.planners import BuiltInPlanner
-# from common.tools import filesystem_toolset
+from common.tools import mcp_pool
+from common.session_store import ShardedSessionService
+from common.visitors import USER_TOKEN_LIMIT, VisitorIdMiddleware, daily_token_key, visitor_user_id
+from common.history import HistoryCompactor
+from common.router import LARGE_MODEL_NAME, SMALL_MODEL_NAME, classify, routing_stats, user_query
+from common.profiling import LoopLagMonitor, SamplingProfiler, to_collapsed, to_speedscope
+from common.timing import RequestStartMiddleware, phase_timers, server_timing, timed_callback
+from common.turns import add_turn_managed_endpoint, turn_manager
+from common.warmup import ModelWarmer
 
 load_dotenv()
 
@@ -49,6 +59,14 @@ class ProfileState(BaseModel):
         default=None,
         description="Message ID of the last response (for correlation)",
     )
+    timings: Optional[dict] = Field(
+        default=None,
+        description="Per-phase latency (ms) of the last turn",
+    )
+    route: Optional[dict] = Field(
+        default=None,
+        description="Model tier and thinking budget picked for the last request",
+    )
 
 
 def add_conversation_note(
@@ -96,10 +114,9 @@ def add_conversation_note(
             f.write(note_content)
         
         # Also add to context list for the agent
-        context_list = tool_context.state.get("conversation_context", [])
-        if context_list is None:
-            context_list = []
-        
+        # Copy rather than append in place so the change is recorded as a state delta
+        context_list = list(tool_context.state.get("conversation_context") or [])
+
         timestamped_note = f"[{timestamp.strftime('%Y-%m-%d %H:%M:%S')}] {note}"
         context_list.append(timestamped_note)
         
@@ -166,9 +183,13 @@ def add_conversation_note(
 #     }
 
 
+@timed_callback("before_agent")
 def on_before_agent(callback_context: CallbackContext):
     """Initialize conversation context and thinking fields if they don't exist."""
 
+    # Lets a superseded or abandoned turn cancel this run, and its in-flight model call
+    turn_manager.bind(callback_context.session.id)
+
     if "conversation_context" not in callback_context.state:
         callback_context.state["conversation_context"] = []
 
@@ -185,27 +206,16 @@ def on_before_agent(callback_context: CallbackContext):
     return None
 
 
-# --- Define the Callback Function ---
-#  modifying the agent's system prompt to include Bharath's complete profile
-def before_model_modifier(
-    callback_context: CallbackContext, llm_request: LlmRequest
-) -> Optional[LlmResponse]:
-    """Inspects/modifies the LLM request or skips the call."""
-    agent_name = callback_context.agent_name
-    if agent_name == "BharathAssistant":
-        # Build conversation notes
-        conversation_notes = "No conversation notes yet"
-        if (
-            "conversation_context" in callback_context.state
-            and callback_context.state["conversation_context"] is not None
-        ):
-            try:
-                conversation_notes = json.dumps(callback_context.state["conversation_context"], indent=2)
-            except Exception as e:
-                conversation_notes = f"Error serializing notes: {str(e)}"
+history_compactor = HistoryCompactor()
+
 
-        # Build comprehensive profile context
-        profile_context = f"""# BHARATH KRISHNA - PROFESSIONAL PROFILE
+def profile_prompt(conversation_notes: str) -> str:
+    """System prompt prefix with Bharath's complete profile, shared by every request.
+
+    Everything before the conversation notes is static, so the model server can reuse
+    its cached prefill across sessions (see the startup warmup).
+    """
+    return f"""# BHARATH KRISHNA - PROFESSIONAL PROFILE
 
 ## Contact Information
 - Phones: +1 8574379316, +91 7760779000
@@ -342,6 +352,39 @@ Demonstrates multi-agent orchestration with planning, validation, and code imple
 ---
 You are Bharath's Personal Assistant. Use this profile information to answer questions about Bharath's background, experience, and skills. When discussing with recruiters, advocate on his behalf by highlighting relevant achievements and experience."""
 
+
+# --- Define the Callback Function ---
+#  modifying the agent's system prompt to include Bharath's complete profile
+@timed_callback("before_model")
+def before_model_modifier(
+    callback_context: CallbackContext, llm_request: LlmRequest
+) -> Optional[LlmResponse]:
+    """Inspects/modifies the LLM request or skips the call."""
+    agent_name = callback_context.agent_name
+    if agent_name == "BharathAssistant":
+        # Per-visitor daily token quota, tracked in user-scoped state shared by all their sessions
+        if USER_TOKEN_LIMIT and callback_context.state.get(daily_token_key(), 0) >= USER_TOKEN_LIMIT:
+            return LlmResponse(
+                content=types.Content(
+                    role="model",
+                    parts=[types.Part(text="You've reached the chat limit for today. Please reach out to Bharath directly at bharath.chakravarthi@gmail.com.")],
+                ),
+                finish_reason=types.FinishReason.STOP,
+            )
+
+        # Build conversation notes
+        conversation_notes = "No conversation notes yet"
+        if (
+            "conversation_context" in callback_context.state
+            and callback_context.state["conversation_context"] is not None
+        ):
+            try:
+                conversation_notes = json.dumps(callback_context.state["conversation_context"], indent=2)
+            except Exception as e:
+                conversation_notes = f"Error serializing notes: {str(e)}"
+
+        profile_context = profile_prompt(conversation_notes)
+
         # Add profile context to system instruction
         original_instruction = llm_request.config.system_instruction or types.Content(
             role="system", parts=[]
@@ -367,14 +410,27 @@ You are Bharath's Personal Assistant. Use this profile information to answer que
         # for Gemini models, we need to set it as Content
         # llm_request.config.system_instruction = original_instruction
 
+        # Keep the re-sent chat history bounded by folding old turns into a rolling summary
+        history_compactor.compact(callback_context.session.id, llm_request)
+
+        # Route by query complexity: small model without thinking for lookups, large model
+        # with a thinking budget for comparisons and job-description fit questions
+        decision = classify(user_query(callback_context.user_content), len(llm_request.contents))
+        llm_request.model = decision.model
+        llm_request.config.thinking_config = types.ThinkingConfig(
+            include_thoughts=False,
+            thinking_budget=decision.thinking_budget,
+        )
+        callback_context.state["route"] = asdict(decision)
+
     # Store start time for metrics
     callback_context.state["_last_request_start"] = time.time()
 
     return None
 
-FINAL_RESPONSE = []
 
 # --- Define the Callback Function ---
+@timed_callback("after_model")
 def simple_after_model_modifier(
     callback_context: CallbackContext, llm_response: LlmResponse
 ) -> Optional[LlmResponse]:
@@ -415,13 +471,17 @@ def simple_after_model_modifier(
                 # Update state
                 total_token_count = callback_context.state.get('total_token_count', 0)
                 callback_context.state['total_token_count'] = total_token_count + total_turn_tokens
+                user_token_count = callback_context.state.get('user:total_token_count', 0)
+                callback_context.state['user:total_token_count'] = user_token_count + total_turn_tokens
+                daily_key = daily_token_key()
+                callback_context.state[daily_key] = callback_context.state.get(daily_key, 0) + total_turn_tokens
                 callback_context.state['last_context_tokens'] = prompt_tokens
                 callback_context.state['last_response_tokens'] = response_tokens
                 callback_context.state['tokens_per_second'] = round(tps, 2)
 
-                # final_response = "".join(FINAL_RESPONSE)
-                # FINAL_RESPONSE = []
-                # llm_response.content.parts[0].text = final_response
+                route = callback_context.state.get('route') or {}
+                routing_stats.record(route.get('tier', 'standard'), duration, response_tokens)
+
             else:
                 llm_response.content.parts[0].text = ""  # Clear intermediate responses
                 return None
@@ -470,6 +530,18 @@ else:
     model = model_name
     print(f"Using native Gemini model: {model_name}")
 
+def before_tool_timer(tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext) -> Optional[Dict]:
+    """Start timing a tool call for the per-phase latency breakdown."""
+    phase_timers.get(tool_context.invocation_id).tool_started(tool_context.function_call_id)
+    return None
+
+
+def after_tool_timer(tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext, tool_response: Dict) -> Optional[Dict]:
+    """Stop timing a tool call."""
+    phase_timers.get(tool_context.invocation_id).tool_finished(tool_context.function_call_id)
+    return None
+
+
 # def simple_after_tool_modifier(tool:BaseTool, args: Dict[str, Any], tool_context: ToolContext, tool_response: Dict) -> Optional[Dict]:
 #     """Example after tool callback that could modify the tool response."""
 #     # For demonstration, we will just pass through the original tool response without modification.
@@ -477,6 +549,10 @@ else:
 #     return None  # Return None to indicate no modification
 
 
+# MCP servers to expose to the agent, e.g. MCP_TOOLSETS=memory,filesystem
+mcp_toolsets = [name.strip() for name in os.getenv("MCP_TOOLSETS", "").split(",") if name.strip()]
+
+
 profile_agent = CustomAgent(
     name="BharathAssistant",
     # model="gemini-2.5-flash",
@@ -511,12 +587,15 @@ Keep your responses short and professional, likve a conversation. With in three
 """,
     tools=[
         add_conversation_note,
+        *(mcp_pool.servers[name] for name in mcp_toolsets),
         # get_weather,
         # get_person_card
     ],
     before_agent_callback=on_before_agent,
     before_model_callback=before_model_modifier,
     after_model_callback=simple_after_model_modifier,
+    before_tool_callback=before_tool_timer,
+    after_tool_callback=after_tool_timer,
     # after_tool_callback=simple_after_tool_modifier,
     planner=BuiltInPlanner(
         thinking_config=types.ThinkingConfig(
@@ -526,16 +605,49 @@ Keep your responses short and professional, likve a conversation. With in three
     )
 )
 
+# Session storage sharded by visitor, with per-session memory accounting, compaction and a global cap
+session_store = ShardedSessionService()
+
 # Create ADK middleware agent instance
 adk_profile_agent = ADKAgent(
     adk_agent=profile_agent,
-    user_id="demo_user",
+    user_id_extractor=visitor_user_id,
     session_timeout_seconds=3600,
+    session_service=session_store,
     use_in_memory_services=True,
 )
 
+# Always-on detection of callbacks that block the event loop, plus an on-demand sampler
+loop_lag_monitor = LoopLagMonitor()
+profiler = SamplingProfiler()
+
+# Load every routed model and cache the profile prefix (as a fresh session sends it) before serving
+model_warmer = ModelWarmer(
+    [model_name, SMALL_MODEL_NAME, LARGE_MODEL_NAME],
+    system_instruction=profile_prompt(json.dumps([], indent=2)),
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start shared resources before serving traffic and release them on shutdown."""
+    loop_lag_monitor.start()
+    if mcp_toolsets:
+        # Spawn and health-check MCP servers up front so the first tool call doesn't pay for it
+        await mcp_pool.start(mcp_toolsets)
+        print(f"MCP toolsets ready: {', '.join(mcp_toolsets)}")
+    # Warms up in the background; readiness is reported once it succeeds (see serve below)
+    model_warmer.start()
+    yield
+    await model_warmer.stop()
+    await mcp_pool.shutdown()
+    await loop_lag_monitor.stop()
+
+
 # Create FastAPI app
-app = FastAPI(title="Profile Agent API")
+app = FastAPI(title="Profile Agent API", lifespan=lifespan)
+app.add_middleware(VisitorIdMiddleware)
+app.add_middleware(RequestStartMiddleware)
 
 
 # --- Exception Handlers ---
@@ -614,8 +726,72 @@ async def health_check():
 #     return health_status
 
 
-# Add the ADK endpoint
-add_adk_fastapi_endpoint(app, adk_profile_agent, path="/")
+@app.get("/debug/mcp")
+async def mcp_stats():
+    """Report MCP process health and per-call latency."""
+    return mcp_pool.snapshot()
+
+
+@app.post("/debug/profile")
+async def profile_event_loop(request: Request, seconds: float = 10, interval_ms: float = 5, format: str = "collapsed"):
+    """Sample the event loop thread for N seconds and return collapsed stacks or a speedscope profile."""
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if admin_token and request.headers.get("x-admin-token") != admin_token:
+        return JSONResponse(status_code=403, content={"error": "Forbidden"})
+    if profiler.running:
+        return JSONResponse(status_code=409, content={"error": "A profile is already running"})
+
+    stacks = await profiler.profile_loop(seconds, interval_ms)
+    if format == "speedscope":
+        return to_speedscope(stacks, profiler.interval_ms)
+    return PlainTextResponse(to_collapsed(stacks))
+
+
+@app.get("/debug/loop")
+async def event_loop_lag():
+    """Worst observed event-loop lag and how often a callback blocked it past the threshold."""
+    return loop_lag_monitor.snapshot()
+
+
+@app.get("/debug/timings/{session_id}")
+async def session_timings(session_id: str):
+    """Per-phase latency of the session's last turn, also returned as a Server-Timing header.
+
+    The AG-UI response is already streaming by the time the phases are known, so the
+    breakdown is served here and in the `timings` state field rather than on that response.
+    """
+    timings = phase_timers.recent.get(session_id)
+    if timings is None:
+        return JSONResponse(status_code=404, content={"error": "No timings for session"})
+    return JSONResponse(content=timings, headers={"Server-Timing": server_timing(timings)})
+
+
+@app.get("/debug/routing")
+async def routing_summary():
+    """Latency and token usage per routing tier."""
+    return routing_stats.snapshot()
+
+
+@app.get("/debug/sessions")
+async def session_memory(limit: int = 10):
+    """List the sessions using the most memory."""
+    return session_store.snapshot(limit)
+
+
+@app.get("/debug/warmup")
+async def warmup_summary():
+    """Latency of the startup and keep-warm requests per model."""
+    return model_warmer.snapshot()
+
+
+@app.get("/debug/turns")
+async def turn_summary():
+    """Superseded and abandoned turns, and the generation time their cancellation saved."""
+    return turn_manager.snapshot()
+
+
+# Add the ADK endpoint, one turn at a time per session
+add_turn_managed_endpoint(app, adk_profile_agent, path="/")
 
 
 # Initialize Langfuse
@@ -657,7 +833,7 @@ track_adk_agent_recursive(profile_agent, opik_tracer)
 if __name__ == "__main__":
     import os
 
-    import uvicorn
+    from common.server import serve
 
     if not os.getenv("GOOGLE_API_KEY"):
         print("⚠️  Warning: GOOGLE_API_KEY environment variable not set!")
@@ -666,4 +842,4 @@ if __name__ == "__main__":
         print()
 
     port = int(os.getenv("PYTHON_PORT", os.getenv("PORT", 8001)))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    serve(app, port, ready=model_warmer.wait_ready)
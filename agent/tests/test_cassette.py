@@ -0,0 +1,73 @@
+import asyncio
+import json
+from typing import AsyncGenerator, List
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai import types
+
+from common.cassette import Cassette, CassetteLlm
+
+
+class ScriptedModel(BaseLlm):
+    """Answers the first turn with an add_conversation_note call and the second with text."""
+
+    calls: int = 0
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        self.calls += 1
+        if self.calls == 1:
+            part = types.Part(function_call=types.FunctionCall(
+                id="call-1", name="add_conversation_note", args={"note": "Hiring for SRE", "source": "Ana"},
+            ))
+        else:
+            part = types.Part(text="Noted, thanks!")
+        yield LlmResponse(content=types.Content(role="model", parts=[part]))
+
+
+def _requests(call_id: str, stamp: str, filename: str) -> List[LlmRequest]:
+    """The two model requests of a turn that writes a note, as ADK builds them at a given time."""
+    question = types.Content(role="user", parts=[types.Part(text="We're hiring an SRE, please note it")])
+    first = LlmRequest(
+        model="fake",
+        contents=[question],
+        config=types.GenerateContentConfig(system_instruction="Notes:\nNo conversation notes yet"),
+    )
+    call = types.Content(role="model", parts=[types.Part(function_call=types.FunctionCall(
+        id=call_id, name="add_conversation_note", args={"note": "Hiring for SRE", "source": "Ana"},
+    ))])
+    result = types.Content(role="user", parts=[types.Part(function_response=types.FunctionResponse(
+        id=call_id,
+        name="add_conversation_note",
+        response={"status": "success", "message": "Note added: Hiring for SRE", "filepath": f"/app/notes/{filename}"},
+    ))])
+    notes = json.dumps([f"[{stamp}] Hiring for SRE"], indent=2)
+    second = LlmRequest(
+        model="fake",
+        contents=[question, call, result],
+        config=types.GenerateContentConfig(system_instruction=f"Notes:\n{notes}"),
+    )
+    return [first, second]
+
+
+async def _run(model: CassetteLlm, requests: List[LlmRequest]) -> List[LlmResponse]:
+    responses = []
+    for request in requests:
+        async for response in model.generate_content_async(request):
+            responses.append(response)
+    return responses
+
+
+def test_replays_a_tool_call_turn_recorded_at_another_time(tmp_path):
+    path = str(tmp_path / "llm.jsonl")
+    inner = ScriptedModel(model="fake")
+    recorder = CassetteLlm(model="fake", inner=inner, mode="record", cassette=Cassette(path))
+    recorded = asyncio.run(_run(recorder, _requests("call-1", "2026-01-02 10:00:00", "2026-01-02_10-00-00_note.md")))
+
+    # A fresh process replays the same conversation with new call IDs and timestamps
+    replayer = CassetteLlm(model="fake", inner=inner, mode="replay", cassette=Cassette(path), speed=0)
+    replayed = asyncio.run(_run(replayer, _requests("call-9", "2026-03-04 18:30:15", "2026-03-04_18-30-15_note.md")))
+
+    assert inner.calls == 2
+    assert [r.model_dump(exclude_none=True) for r in replayed] == [r.model_dump(exclude_none=True) for r in recorded]
+    assert replayed[0].content.parts[0].function_call.name == "add_conversation_note"
+    assert replayed[1].content.parts[0].text == "Noted, thanks!"
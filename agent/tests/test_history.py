@@ -0,0 +1,52 @@
+import asyncio
+from typing import AsyncGenerator
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai import types
+
+from common import history
+from common.history import HistoryCompactor, estimate_tokens
+
+
+class CountingModel(BaseLlm):
+    calls: int = 0
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        self.calls += 1
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=f"summary {self.calls}")]))
+
+
+def _turn(i: int):
+    return [
+        types.Content(role="user", parts=[types.Part(text=f"question {i} " + "word " * 100)]),
+        types.Content(role="model", parts=[types.Part(text=f"answer {i} " + "word " * 200)]),
+    ]
+
+
+async def _chat(compactor: HistoryCompactor, turns: int):
+    contents, sizes = [], []
+    for i in range(turns):
+        contents += _turn(i)
+        request = LlmRequest(contents=list(contents))
+        compactor.compact("session", request)
+        sizes.append(estimate_tokens(request.contents))
+        # Let the background summary finish before the next turn
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+    return sizes
+
+
+def test_summarizes_in_batches_not_every_turn():
+    model = CountingModel(model="fake")
+    sizes = asyncio.run(_chat(HistoryCompactor(summary_model=model), 40))
+    # ~375 tokens per turn and 1500-token batches: one call per ~4 turns once over budget
+    assert 0 < model.calls <= 10, model.calls
+    assert max(sizes) <= history.HISTORY_MAX_TOKENS + 400
+
+
+def test_without_summary_model_old_turns_are_dropped(monkeypatch):
+    monkeypatch.setattr(history, "SUMMARY_MODEL_NAME", None)
+    compactor = HistoryCompactor()
+    assert compactor.summary_model is None
+    sizes = asyncio.run(_chat(compactor, 40))
+    assert max(sizes) <= history.HISTORY_MAX_TOKENS + 400
@@ -0,0 +1,30 @@
+import pytest
+
+from common.router import classify
+
+
+@pytest.mark.parametrize(
+    "query, tier",
+    [
+        ("What's his email?", "simple"),
+        ("Hi there", "simple"),
+        ("How many years of Python experience does he have?", "simple"),
+        ("Why did he move from backend work to ML infrastructure?", "standard"),
+        ("Has he deployed LLMs in production? Which serving stack did he use?", "standard"),
+        ("Compare his experience to this job description: senior platform engineer, Kubernetes, Go.", "complex"),
+        (
+            "We need a platform engineer to run GPU inference on Kubernetes with Terraform-managed infra and a "
+            "Python/Go codebase. How well does his experience match, and where are the gaps?",
+            "complex",
+        ),
+        ("Is he a fit for this role?", "complex"),
+    ],
+)
+def test_classify_tiers(query, tier):
+    assert classify(query).tier == tier
+
+
+def test_complex_tier_gets_a_thinking_budget():
+    decision = classify("Compare his experience to this job description")
+    assert decision.thinking_budget > 0
+    assert "fit_terms:2" in decision.reasons
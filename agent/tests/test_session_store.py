@@ -0,0 +1,148 @@
+import asyncio
+
+from google.adk.events import Event
+from google.genai import types
+
+from common import session_store
+from common.session_store import SUMMARY_HEADER, BoundedInMemorySessionService, ShardedSessionService
+from common.visitors import DAILY_TOKEN_PREFIX
+
+APP = "app"
+AGENT = "BharathAssistant"
+
+
+def _event(author: str, text: str, invocation: int) -> Event:
+    role = "user" if author == "user" else "model"
+    return Event(
+        author=author,
+        invocation_id=f"inv-{invocation}",
+        content=types.Content(role=role, parts=[types.Part(text=text)]),
+    )
+
+
+async def _chat(service, session, turns: int, text: str = "hello") -> None:
+    for turn in range(turns):
+        await service.append_event(session, _event("user", f"{text} {turn}", turn))
+        await service.append_event(session, _event(AGENT, f"reply {turn}", turn))
+
+
+def _stored(service, session):
+    return service.sessions[APP][session.user_id][session.id]
+
+
+def _total(service) -> int:
+    return sum(service._event_bytes.values()) + sum(service._state_bytes.values())
+
+
+def test_compaction_keeps_one_bounded_summary_authored_by_agent(monkeypatch):
+    monkeypatch.setattr(session_store, "SESSION_COMPACT_AFTER_EVENTS", 10)
+    monkeypatch.setattr(session_store, "SESSION_KEEP_RECENT_EVENTS", 4)
+    monkeypatch.setattr(session_store, "SESSION_SUMMARY_MAX_CHARS", 300)
+
+    async def run():
+        service = BoundedInMemorySessionService()
+        session = await service.create_session(app_name=APP, user_id="u1")
+        await _chat(service, session, 40, text="x" * 50)
+        return service, _stored(service, session)
+
+    service, stored = asyncio.run(run())
+    summaries = [e for e in stored.events if e.custom_metadata and e.custom_metadata.get("session_summary")]
+    assert service.compactions > 3
+    assert len(summaries) == 1
+    assert stored.events[0] is summaries[0]
+    summary_text = summaries[0].content.parts[0].text
+    assert summary_text.count(SUMMARY_HEADER) == 1
+    assert len(summary_text) <= 300 + len(SUMMARY_HEADER) + 1
+    assert summaries[0].author == AGENT
+    # The most recent turns survive verbatim, the cut falling on a user turn
+    assert stored.events[-1].content.parts[0].text == "reply 39"
+    assert stored.events[1].author == "user"
+    assert service.total_bytes == _total(service)
+
+
+def test_eviction_drops_idle_sessions_and_keeps_the_active_one():
+    async def run():
+        service = BoundedInMemorySessionService(memory_cap_bytes=10**9, max_sessions_per_user=None)
+        idle = [await service.create_session(app_name=APP, user_id=f"idle{i}") for i in range(3)]
+        for session in idle:
+            await _chat(service, session, 3)
+        active = await service.create_session(app_name=APP, user_id="active")
+        await _chat(service, active, 1)
+        # Lower the cap so the next event pushes the total over it
+        service.memory_cap_bytes = service.session_bytes((APP, "active", active.id)) * 2
+        await _chat(service, active, 1)
+        return service, active
+
+    service, active = asyncio.run(run())
+    assert service.evictions >= 1
+    assert (APP, "active", active.id) in service._last_access
+    assert service.total_bytes <= service.memory_cap_bytes
+    assert service.total_bytes == _total(service)
+
+
+def test_per_user_session_limit_drops_least_recently_used():
+    async def run():
+        service = BoundedInMemorySessionService(max_sessions_per_user=2)
+        first = await service.create_session(app_name=APP, user_id="u1")
+        second = await service.create_session(app_name=APP, user_id="u1")
+        # Touch the first so the second becomes least recently used
+        await service.get_session(app_name=APP, user_id="u1", session_id=first.id)
+        third = await service.create_session(app_name=APP, user_id="u1")
+        other = await service.create_session(app_name=APP, user_id="u2")
+        return service, first, second, third, other
+
+    service, first, second, third, other = asyncio.run(run())
+    assert set(service.sessions[APP]["u1"]) == {first.id, third.id}
+    assert other.id in service.sessions[APP]["u2"]
+    assert service.total_bytes == _total(service)
+
+
+def test_sharded_cap_is_global_and_evicts_across_shards():
+    async def run():
+        service = ShardedSessionService(shards=4, memory_cap_bytes=10**9)
+        idle = [await service.create_session(app_name=APP, user_id=f"idle{i}") for i in range(8)]
+        for session in idle:
+            await _chat(service, session, 3)
+        active = await service.create_session(app_name=APP, user_id="active")
+        await _chat(service, active, 3)
+        # One active session may use more than a quarter of the cap; only the pod total counts
+        active_shard = service.shard_for("active")
+        service.memory_cap_bytes = active_shard.session_bytes((APP, "active", active.id)) * 2
+        await _chat(service, active, 1)
+        return service, active
+
+    service, active = asyncio.run(run())
+    assert all(shard.memory_cap_bytes is None for shard in service.shards)
+    assert sum(shard.evictions for shard in service.shards) >= 1
+    assert (APP, "active", active.id) in service.shard_for("active")._last_access
+    assert service.total_bytes <= service.memory_cap_bytes
+    assert service.snapshot()["cap_bytes"] == service.memory_cap_bytes
+
+
+def test_user_state_drops_old_daily_counters_and_goes_with_last_session():
+    def tokens(day: str, count: int, invocation: int) -> Event:
+        event = _event(AGENT, "reply", invocation)
+        event.actions.state_delta = {
+            "user:total_token_count": count,
+            f"{DAILY_TOKEN_PREFIX}{day}": count,
+        }
+        return event
+
+    async def run():
+        service = BoundedInMemorySessionService(max_sessions_per_user=None)
+        first = await service.create_session(app_name=APP, user_id="u1")
+        second = await service.create_session(app_name=APP, user_id="u1")
+        await service.append_event(first, tokens("2026-01-01", 10, 1))
+        await service.append_event(first, tokens("2026-01-02", 20, 2))
+        user_state = dict(service.user_state[APP]["u1"])
+        await service.delete_session(app_name=APP, user_id="u1", session_id=first.id)
+        kept = dict(service.user_state[APP]["u1"])
+        await service.delete_session(app_name=APP, user_id="u1", session_id=second.id)
+        return service, user_state, kept
+
+    service, user_state, kept = asyncio.run(run())
+    assert user_state == {"total_token_count": 20, "tokens_2026-01-02": 20}
+    # Still has a session, so the quota survives
+    assert kept == user_state
+    assert "u1" not in service.user_state[APP]
+    assert "u1" not in service.sessions[APP]
@@ -0,0 +1,128 @@
+import asyncio
+import json
+
+import pytest
+from ag_ui.core import EventType, RunFinishedEvent, RunStartedEvent
+from fastapi import FastAPI
+
+from common import turns
+from common.turns import TurnManager, add_turn_managed_endpoint
+
+
+class FakeAgent:
+    """Stands in for ADKAgent: runs the "model" in a background task, as ag_ui_adk does."""
+
+    def __init__(self):
+        self.tasks = []
+
+    async def run(self, input_data):
+        seconds = input_data.forwarded_props["seconds"]
+
+        async def adk_run():
+            turns.turn_manager.bind(input_data.thread_id)
+            await asyncio.sleep(seconds)
+
+        task = asyncio.create_task(adk_run())
+        self.tasks.append(task)
+        yield RunStartedEvent(type=EventType.RUN_STARTED, thread_id=input_data.thread_id, run_id=input_data.run_id)
+        await asyncio.wait({task})
+        task.result()
+        yield RunFinishedEvent(type=EventType.RUN_FINISHED, thread_id=input_data.thread_id, run_id=input_data.run_id)
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(turns, "turn_manager", TurnManager())
+    monkeypatch.setattr(turns, "DISCONNECT_POLL_SECONDS", 0.01)
+    app = FastAPI()
+    app.state.agent = FakeAgent()
+    add_turn_managed_endpoint(app, app.state.agent)
+    return app
+
+
+async def _post(app, thread_id: str, seconds: float, disconnect_after: float = None) -> bytes:
+    body = json.dumps({
+        "threadId": thread_id, "runId": f"run-{seconds}", "state": {}, "messages": [],
+        "tools": [], "context": [], "forwardedProps": {"seconds": seconds},
+    }).encode()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.3"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": "/", "raw_path": b"/", "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"accept", b"text/event-stream")],
+        "client": ("test", 1), "server": ("test", 80),
+    }
+    received = False
+    chunks = []
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        if disconnect_after is None:
+            await asyncio.Event().wait()
+        await asyncio.sleep(disconnect_after)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(chunks)
+
+
+def test_new_message_supersedes_running_turn(app):
+    async def run():
+        first = asyncio.create_task(_post(app, "thread", seconds=5))
+        await asyncio.sleep(0.1)
+        second = await _post(app, "thread", seconds=0.05)
+        return await first, second
+
+    first, second = asyncio.run(run())
+    # The superseded stream still ends with a terminal event
+    assert b"TURN_SUPERSEDED" in first
+    assert b"RUN_FINISHED" in second
+    assert app.state.agent.tasks[0].cancelled()
+    stats = turns.turn_manager.snapshot()
+    assert stats["superseded"] == 1
+    assert stats["completed"] == 1
+    assert stats["active_turns"] == 0
+    assert turns.turn_manager._locks == {}
+
+
+def test_client_disconnect_abandons_turn(app):
+    body = asyncio.run(_post(app, "thread", seconds=5, disconnect_after=0.1))
+    assert b"RUN_FINISHED" not in body
+    assert app.state.agent.tasks[0].cancelled()
+    stats = turns.turn_manager.snapshot()
+    assert stats["abandoned"] == 1
+    assert stats["completed"] == 0
+
+
+def test_turns_on_different_sessions_run_concurrently(app):
+    async def run():
+        return await asyncio.gather(_post(app, "a", seconds=0.2), _post(app, "b", seconds=0.2))
+
+    bodies = asyncio.run(run())
+    assert all(b"RUN_FINISHED" in body for body in bodies)
+    assert turns.turn_manager.snapshot()["superseded"] == 0
+
+
+def test_turn_cancelled_before_run_starts_never_generates():
+    manager = TurnManager()
+
+    async def run():
+        async with manager.turn("thread"):
+            manager.cancel("thread", "superseded")
+
+            async def adk_run():
+                manager.bind("thread")
+                await asyncio.sleep(5)
+
+            task = asyncio.create_task(adk_run())
+            await asyncio.wait({task})
+            return task
+
+    assert asyncio.run(run()).cancelled()
+    assert manager.stats["superseded"] == 1
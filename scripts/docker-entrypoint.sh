@@ -3,19 +3,46 @@ set -e
 
 echo "Starting FamilyMan UI services..."
 
+# The agent signals SIGUSR1 once it is accepting connections (see agent/common/server.py)
+AGENT_READY=""
+AGENT_TIMED_OUT=""
+trap 'AGENT_READY=1' USR1
+trap 'AGENT_TIMED_OUT=1' USR2
+
 # Start the FastAPI agent in the background
-echo "Starting FastAPI agent on port ${PYTHON_PORT:-8001}..."
+if [ -n "$AGENT_UDS_PATH" ]; then
+    echo "Starting FastAPI agent on unix socket $AGENT_UDS_PATH..."
+else
+    echo "Starting FastAPI agent on port ${PYTHON_PORT:-8001}..."
+fi
 cd /app/agent
-python main.py &
+AGENT_NOTIFY_PID=$$ python main.py &
 AGENT_PID=$!
 
-# Wait for agent to be ready
+# Give up if the agent isn't accepting connections in time. The model warmup runs in the
+# background and doesn't hold this up, so the site is served while the model loads.
+AGENT_READY_TIMEOUT=${AGENT_READY_TIMEOUT:-60}
+( sleep $AGENT_READY_TIMEOUT; kill -USR2 $$ 2>/dev/null ) &
+TIMER_PID=$!
+
+# Wait for agent to be ready; `wait` returns when a trapped signal arrives or the agent exits
 echo "Waiting for agent to be ready..."
-timeout 60 sh -c 'until nc -z localhost 8001; do sleep 1; done' || {
-    echo "ERROR: Agent failed to start within 60 seconds"
-    kill $AGENT_PID 2>/dev/null || true
+while [ -z "$AGENT_READY" ] && [ -z "$AGENT_TIMED_OUT" ] && kill -0 $AGENT_PID 2>/dev/null; do
+    AGENT_STATUS=0
+    wait $AGENT_PID || AGENT_STATUS=$?
+done
+kill $TIMER_PID 2>/dev/null || true
+
+if [ -z "$AGENT_READY" ]; then
+    if kill -0 $AGENT_PID 2>/dev/null; then
+        echo "ERROR: Agent failed to start within $AGENT_READY_TIMEOUT seconds"
+        kill $AGENT_PID 2>/dev/null || true
+    else
+        # Exited during startup, e.g. the lifespan raised
+        echo "ERROR: Agent exited with status $AGENT_STATUS before becoming ready"
+    fi
     exit 1
-}
+fi
 echo "Agent is ready!"
 
 # Start Next.js in the foreground
@@ -0,0 +1,14 @@
+#!/bin/bash
+# Pre-install the MCP server packages so the agent can launch them offline.
+# Point MCP_VENDOR_DIR at the install directory when running the agent.
+
+set -e
+
+VENDOR_DIR="${MCP_VENDOR_DIR:-$(dirname "$0")/../agent/mcp_vendor}"
+
+mkdir -p "$VENDOR_DIR"
+npm install --prefix "$VENDOR_DIR" --no-audit --no-fund \
+    @modelcontextprotocol/server-memory \
+    @modelcontextprotocol/server-filesystem
+
+echo "MCP servers installed in $VENDOR_DIR"
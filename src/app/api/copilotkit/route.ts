@@ -3,29 +3,68 @@ import {
   ExperimentalEmptyAdapter,
   copilotRuntimeNextJSAppRouterEndpoint,
 } from "@copilotkit/runtime";
-import { HttpAgent } from "@ag-ui/client";
+import { HttpAgent, RunAgentInput } from "@ag-ui/client";
 import { NextRequest } from "next/server";
- 
+import { AsyncLocalStorage } from "node:async_hooks";
+import { Agent as UndiciAgent } from "undici";
+
+// Cookie identifying a visitor across sessions; forwarded to the agent so each
+// visitor gets their own user ID (and session shard / quota) on the Python side.
+const VISITOR_COOKIE = "visitor_id";
+const VISITOR_MAX_AGE = 60 * 60 * 24 * 30;
+
+// Visitor ID of the request being handled, read when the agent request is built.
+const visitorContext = new AsyncLocalStorage<string>();
+
+// When the agent listens on a Unix domain socket (AGENT_UDS_PATH, same container),
+// route requests over it instead of loopback TCP. The URL host is then ignored.
+const agentSocketPath = process.env.AGENT_UDS_PATH;
+const agentDispatcher = agentSocketPath
+  ? new UndiciAgent({ connect: { socketPath: agentSocketPath } })
+  : undefined;
+
+class VisitorHttpAgent extends HttpAgent {
+  protected requestInit(input: RunAgentInput): RequestInit {
+    const init = super.requestInit(input);
+    const visitorId = visitorContext.getStore();
+    return {
+      ...init,
+      headers: { ...(init.headers as Record<string, string>), ...(visitorId && { "X-Visitor-Id": visitorId }) },
+      dispatcher: agentDispatcher,
+    } as RequestInit;
+  }
+}
+
 // 1. You can use any service adapter here for multi-agent support. We use
 //    the empty adapter since we're only using one agent.
 const serviceAdapter = new ExperimentalEmptyAdapter();
- 
+
 // 2. Create the CopilotRuntime instance and utilize the AG-UI client
 //    to setup the connection with the ADK agent.
 const runtime = new CopilotRuntime({
   agents: {
     // Our FastAPI endpoint URL
-    "BharathAssistant": new HttpAgent({url: "http://localhost:8001/"}),
+    "BharathAssistant": new VisitorHttpAgent({ url: "http://localhost:8001/" }),
   } as any
 });
- 
+
 // 3. Build a Next.js API route that handles the CopilotKit runtime requests.
+const { handleRequest } = copilotRuntimeNextJSAppRouterEndpoint({
+  runtime,
+  serviceAdapter,
+  endpoint: "/api/copilotkit",
+});
+
 export const POST = async (req: NextRequest) => {
-  const { handleRequest } = copilotRuntimeNextJSAppRouterEndpoint({
-    runtime, 
-    serviceAdapter,
-    endpoint: "/api/copilotkit",
-  });
- 
-  return handleRequest(req);
-};
\ No newline at end of file
+  const existingVisitorId = req.cookies.get(VISITOR_COOKIE)?.value;
+  const visitorId = existingVisitorId ?? crypto.randomUUID();
+
+  const response = await visitorContext.run(visitorId, () => handleRequest(req));
+  if (!existingVisitorId) {
+    response.headers.append(
+      "Set-Cookie",
+      `${VISITOR_COOKIE}=${visitorId}; Path=/; Max-Age=${VISITOR_MAX_AGE}; HttpOnly; SameSite=Lax`,
+    );
+  }
+  return response;
+};